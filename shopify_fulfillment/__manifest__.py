@@ -12,6 +12,7 @@
         "security/ir.model.access.csv",
         "data/config_params.xml",
         "data/cron.xml",
+        "data/mail_template.xml",
         "data/default_boxes.xml",
         "data/product_data.xml",
         "views/shopify_order_views.xml",
@@ -1,15 +1,14 @@
-import base64
-import hmac
 import json
 import logging
-from hashlib import sha256
 
+from dateutil import parser as dateutil_parser
 from odoo import http
 from odoo.http import request
 from psycopg2 import IntegrityError
 
 from ..services.alert_service import AlertService
 from ..services.address_utils import normalize_address_lines
+from ..services.shopify_api import ShopifyAPI
 
 _logger = logging.getLogger(__name__)
 
@@ -33,7 +32,7 @@ class ShopifyWebhookController(http.Controller):
         if not secret:
             return http.Response("Webhook secret not configured", status=500)
 
-        if not self._validate_hmac(raw_body, signature, secret):
+        if not ShopifyAPI.validate_webhook(raw_body, signature, secret):
             _logger.warning("Invalid Shopify webhook signature")
             return http.Response("Invalid signature", status=401)
 
@@ -108,14 +107,6 @@ class ShopifyWebhookController(http.Controller):
             )
             return http.Response("Webhook processing failed", status=500)
 
-    @staticmethod
-    def _validate_hmac(payload: bytes, signature: str, secret: str) -> bool:
-        if not signature:
-            return False
-        digest = hmac.new(secret.encode(), payload, sha256).digest()
-        computed = base64.b64encode(digest).decode()
-        return hmac.compare_digest(computed, signature)
-
     def _prepare_order_vals(self, payload: dict):
         order_model = request.env["shopify.order"]
         shipping = payload.get("shipping_address") or {}
@@ -179,8 +170,7 @@ class ShopifyWebhookController(http.Controller):
         if not date_str:
             return False
         try:
-            from dateutil import parser
-            dt = parser.parse(date_str)
+            dt = dateutil_parser.parse(date_str)
             return dt.replace(tzinfo=None)  # Odoo expects naive UTC
         except Exception:
             return False
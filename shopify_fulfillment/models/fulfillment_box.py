@@ -1,4 +1,19 @@
-from odoo import api, fields, models
+from odoo import api, fields, models, tools
+
+from ..services.multi_box_packer import box_specs_from_data
+
+
+# Fields handed to the packer; read once and cached until a box changes.
+BOX_PACKING_FIELDS = [
+    "name",
+    "length",
+    "width",
+    "height",
+    "max_weight",
+    "box_weight",
+    "volume",
+    "priority",
+]
 
 
 class FulfillmentBox(models.Model):
@@ -25,5 +40,31 @@ class FulfillmentBox(models.Model):
             else:
                 rec.volume = 0.0
 
+    @api.model
+    @tools.ormcache()
+    def _get_active_boxes_data(self):
+        """Return the active box catalog as packer BoxSpecs.
+
+        The catalog changes rarely but is needed for every processed order,
+        so it is read in one query, converted and sorted once, and kept in
+        the registry cache until a box is created, written or deleted.
+        Callers must not mutate the specs.
+        """
+        boxes = self.sudo().search([("active", "=", True)])
+        return box_specs_from_data(boxes.read(BOX_PACKING_FIELDS, load="_classic_write"))
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
 
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
 
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
@@ -2,6 +2,8 @@ import logging
 
 from odoo import fields, models
 
+from ..services.alert_service import AlertService
+
 
 _logger = logging.getLogger(__name__)
 
@@ -45,8 +47,6 @@ class PrintJob(models.Model):
     def _send_failed_print_alert(self, message: str):
         self.ensure_one()
         try:
-            from odoo.addons.shopify_fulfillment.services.alert_service import AlertService
-
             order = self.order_id if self.order_id else None
             AlertService.from_env(self.env).notify_error(
                 title="Print Job Failed",
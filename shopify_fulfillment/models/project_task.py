@@ -2,6 +2,8 @@ import logging
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError
 
+from ..services.alert_service import AlertService
+
 _logger = logging.getLogger(__name__)
 
 class ProjectTask(models.Model):
@@ -37,8 +39,6 @@ class ProjectTask(models.Model):
     def _send_task_error_alert(self, title: str, message: str):
         self.ensure_one()
         try:
-            from odoo.addons.shopify_fulfillment.services.alert_service import AlertService
-
             AlertService.from_env(self.env).notify_error(
                 title=title,
                 message=message,
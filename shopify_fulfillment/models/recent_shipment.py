@@ -119,7 +119,7 @@ class ShippoRecentTransaction(models.TransientModel):
                 raise exceptions.UserError(
                     "No local ZPL found and Shippo API key is not configured to download label content."
                 )
-            downloaded_data = shippo._download_url(self.label_url)
+            downloaded_data = shippo.fetch_label_zpl(self.label_url)
 
             if not downloaded_data:
                 raise exceptions.UserError("Unable to retrieve label data for reprint.")
@@ -1,5 +1,7 @@
 from odoo import fields, models, api
 
+from ..services.alert_service import AlertService
+
 
 class ShopifyConfigWizard(models.TransientModel):
     _name = 'shopify.config.wizard'
@@ -115,8 +117,6 @@ class ShopifyConfigWizard(models.TransientModel):
         # Persist current draft values first so test uses what user just entered.
         self.action_save()
 
-        from odoo.addons.shopify_fulfillment.services.alert_service import AlertService
-
         message = (
             "This is a test alert from Shopify Fulfillment configuration. "
             "If you received this, immediate error alerts are active."
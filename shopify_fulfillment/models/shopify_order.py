@@ -1,16 +1,43 @@
+import functools
 import json
 import logging
 import re
 import unicodedata
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
 from html import escape
 from typing import Optional
 
+from dateutil import parser as dateutil_parser
+
 from odoo import api, exceptions, fields, models
+from odoo.tools.sql import create_index
 from ..services.address_utils import normalize_address_lines
+from ..services.alert_service import AlertService
+from ..services.multi_box_packer import MultiBoxPacker, PackingResult
+from ..services.shippo_service import ShippoService
+from ..services.shopify_api import ShopifyAPI
 
 _logger = logging.getLogger(__name__)
 
 
+# Upper bound on concurrent Shippo rate-shop/label calls per processing batch.
+MAX_RATE_SHOP_WORKERS = 8
+
+# Concurrent Shopify order fetches during status sync; stays well inside
+# the Admin API request bucket.
+MAX_STATUS_SYNC_WORKERS = 4
+
+# Concurrent per-line Shopify inventory/metafield reads for one order.
+MAX_INVENTORY_LOOKUP_WORKERS = 4
+
+# Above this many orders, _compute_totals aggregates lines in SQL.
+BULK_TOTALS_THRESHOLD = 10
+
+# Orders in these states are done locally; Shopify status sync skips them.
+STATUS_SYNC_SKIP_STATES = frozenset({"shipped", "inventory_synced"})
+
 SHIPPING_METHOD_STOP_WORDS = {
     "air",
     "delivery",
@@ -19,6 +46,67 @@ SHIPPING_METHOD_STOP_WORDS = {
     "service",
 }
 
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Checked in order; the first matching pattern decides the speed class.
+SHIPPING_SPEED_PATTERNS = (
+    (re.compile(r"\b(overnight|next day|nextday|1 day|one day|priority overnight|first overnight)\b"), "overnight"),
+    (re.compile(r"\b(2 day|two day|2nd day|second day|48 hour)\b"), "two_day"),
+    (re.compile(r"\b(3 day|three day|3rd day|third day|72 hour)\b"), "three_day"),
+    (re.compile(r"\b(express|expedited|rush)\b"), "expedited"),
+    (re.compile(r"\b(priority)\b"), "expedited"),
+    (re.compile(r"\b(ground|standard|economy|saver|surepost|smartpost)\b"), "ground"),
+)
+
+
+@functools.lru_cache(maxsize=1024)
+def _normalize_shipping_text_cached(value: str) -> str:
+    # Carrier and service names come from a small fixed vocabulary, so the
+    # same strings are normalized for every rate of every order.
+    normalized = unicodedata.normalize("NFKD", value)
+    normalized = normalized.encode("ascii", "ignore").decode("ascii")
+    normalized = normalized.lower()
+    normalized = _NON_ALNUM_RE.sub(" ", normalized)
+    return _WHITESPACE_RE.sub(" ", normalized).strip()
+
+
+def _fetch_concurrently(fn, keys, max_workers):
+    """Call ``fn(key)`` for each distinct key on a thread pool.
+
+    ``fn`` must only do HTTP work: worker threads don't own the ORM cursor.
+    Returns {key: (result, exception)} so callers can handle failures in
+    their own order.
+    """
+    keys = list(dict.fromkeys(keys))
+    outcomes = {}
+    if not keys:
+        return outcomes
+    with ThreadPoolExecutor(max_workers=min(len(keys), max_workers)) as executor:
+        futures = {executor.submit(fn, key): key for key in keys}
+        for future in as_completed(futures):
+            try:
+                outcomes[futures[future]] = (future.result(), None)
+            except Exception as exc:  # pylint: disable=broad-except
+                outcomes[futures[future]] = (None, exc)
+    return outcomes
+
+
+def _fetch_line_inventory(api, variant_id, product_id, location_id):
+    """Shopify inventory reads for one order line (HTTP only).
+
+    Restock metafield failures are returned rather than raised, since the
+    callers treat them differently from inventory failures.
+    """
+    inventory_item_id = api.get_variant_inventory_item_id(variant_id)
+    available_qty = api.get_available_inventory_quantity(inventory_item_id, location_id)
+    try:
+        restock_metafields = api.get_variant_restock_metafields(variant_id, product_id)
+        restock_error = None
+    except Exception as exc:  # pylint: disable=broad-except
+        restock_metafields, restock_error = None, exc
+    return inventory_item_id, available_qty, restock_metafields, restock_error
+
 
 class ShopifyOrder(models.Model):
     """Shopify order stub model."""
@@ -94,10 +182,24 @@ class ShopifyOrder(models.Model):
     )
     active = fields.Boolean(default=True)
     created_at = fields.Datetime()
-    raw_payload = fields.Text()
+    # Full Shopify order JSON (often tens of KB). Not prefetched, so list
+    # views and batch reads of other fields don't load it for every row.
+    raw_payload = fields.Text(prefetch=False)
     requested_shipping_method = fields.Char(string="Requested Shipping Method")
+    requested_shipping_method_norm = fields.Char(
+        string="Requested Shipping (Normalized)",
+        compute="_compute_requested_shipping_method_norm",
+        store=True,
+        help="Requested method merged with the payload's shipping-line hints "
+        "and normalized, as used for rate matching.",
+    )
     shopify_location_id = fields.Char(string="Shopify Location ID", index=True)
     pos_inventory_synced_at = fields.Datetime(string="POS Inventory Synced At", readonly=True)
+    last_shopify_sync_at = fields.Datetime(
+        string="Last Shopify Sync",
+        readonly=True,
+        copy=False,
+    )
     pos_inventory_sync_summary = fields.Text(string="POS Inventory Sync Summary", readonly=True)
     shopify_risk_level = fields.Selection(
         [("HIGH", "High"), ("MEDIUM", "Medium"), ("LOW", "Low")], 
@@ -119,6 +221,25 @@ class ShopifyOrder(models.Model):
         help="Linked Odoo Sale Order created upon fulfillment"
     )
 
+    def init(self):
+        super().init()
+        # Partial indexes for the crons: queued orders waiting to be
+        # processed (read in _order), and active orders due a status sync.
+        create_index(
+            self.env.cr,
+            "shopify_order_queued_pending_idx",
+            self._table,
+            ["created_at DESC", "id DESC"],
+            where="state = 'pending' AND auto_process_queued",
+        )
+        create_index(
+            self.env.cr,
+            "shopify_order_active_sync_idx",
+            self._table,
+            ["last_shopify_sync_at"],
+            where="active",
+        )
+
     def _create_sale_order(self):
         """Create an Odoo sale.order from this Shopify order."""
         self.ensure_one()
@@ -430,14 +551,54 @@ class ShopifyOrder(models.Model):
             order.inventory_deducted = bool(tasks)
 
     # Note: Removed the 'read' override to avoid Odoo 18 registry/compute loops.
-    # Users should use the 'Sync' button to refresh status from Shopify manually.
+    # Status is refreshed in the background by cron_sync_shopify_status; users
+    # can still use the 'Sync' button to refresh selected orders immediately.
+
+    @api.model
+    def cron_sync_shopify_status(self):
+        """Archive orders fulfilled or cancelled in Shopify, off the UI path."""
+        try:
+            self._get_shopify_api()
+        except Exception as exc:  # pylint: disable=broad-except
+            _logger.warning("Cron: skipping Shopify status sync: %s", exc)
+            return
+        # Orders synced within the TTL (e.g. by the Sync button) are skipped.
+        cutoff = fields.Datetime.now() - timedelta(seconds=self._status_sync_ttl_seconds())
+        orders = self.search(
+            [
+                ("active", "=", True),
+                ("state", "not in", list(STATUS_SYNC_SKIP_STATES)),
+                ("source", "!=", "pos"),
+                "|",
+                ("last_shopify_sync_at", "=", False),
+                ("last_shopify_sync_at", "<", cutoff),
+            ]
+        )
+        if not orders:
+            return
+        _logger.info("Cron: syncing Shopify status for %d order(s)", len(orders))
+        orders._sync_shopify_status()
+
+    @api.model
+    def _status_sync_ttl_seconds(self) -> int:
+        raw = self.env["ir.config_parameter"].sudo().get_param("fulfillment.sync_ttl_seconds", "300")
+        try:
+            return max(int(raw), 0)
+        except (TypeError, ValueError):
+            _logger.warning("Invalid fulfillment.sync_ttl_seconds value: %s", raw)
+            return 300
 
     def _sync_shopify_status(self):
         """Fetch latest status from Shopify and update local state."""
         # Identify records that need syncing
         # We only sync records that have a shopify_id and are not already archived (though self should be active usually)
         # We process in batches
-        records_to_sync = self.filtered(lambda r: r.shopify_id and r.active and r.source != "pos")
+        records_to_sync = self.filtered(
+            lambda r: r.shopify_id
+            and r.active
+            and r.source != "pos"
+            and r.state not in STATUS_SYNC_SKIP_STATES
+        )
         if not records_to_sync:
             return
 
@@ -445,50 +606,54 @@ class ShopifyOrder(models.Model):
             api = self._get_shopify_api()
         except Exception as exc:  # pylint: disable=broad-except
             return self._mark_pos_inventory_sync_manual_required(str(exc))
-        
-        # Batch by 50
+
+        # Batch by 50. Batches are fetched concurrently (HTTP only, no ORM
+        # access on worker threads) and applied here as they complete.
         batch_size = 50
-        record_list = list(records_to_sync)
-        for i in range(0, len(record_list), batch_size):
-            batch = record_list[i : i + batch_size]
-            shopify_ids = [r.shopify_id for r in batch]
-            
-            try:
-                shopify_orders = api.get_orders(shopify_ids)
-                self._update_local_orders(batch, shopify_orders)
-            except Exception as e:
-                _logger.error("Error syncing batch: %s", e)
+        batches = [
+            records_to_sync[i : i + batch_size]
+            for i in range(0, len(records_to_sync), batch_size)
+        ]
+        workers = min(len(batches), MAX_STATUS_SYNC_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(api.get_orders, batch.mapped("shopify_id")): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                # A batch that failed to fetch or apply is left unstamped,
+                # so the next cron run picks it up again.
+                try:
+                    self._update_local_orders(futures[future], future.result())
+                except Exception:  # pylint: disable=broad-except
+                    _logger.exception("Error syncing batch")
 
     def _update_local_orders(self, batch_records, shopify_data):
-        """Update records based on Shopify data."""
-        data_map = {str(order["id"]): order for order in shopify_data}
-        
-        for record in batch_records:
-            data = data_map.get(record.shopify_id)
-            if not data:
-                continue
-            
-            ff_status = data.get("fulfillment_status")
-            financial_status = data.get("financial_status")
-            
-            # Logic: If fulfilled, remove from Odoo (archive)
-            # fulfillment_status can be: null, fulfilled, partial, restocked
-            if ff_status == "fulfilled":
-                record.active = False
-            elif ff_status == "partial":
-                 # Keep it, maybe update state?
-                 pass
-            elif ff_status is None:
-                # Unfulfilled
-                pass
-            
-            # Additional Sync: If cancelled, maybe archive too?
-            if data.get("cancelled_at"):
-                record.active = False
+        """Update records based on Shopify data.
 
-    def _get_shopify_api(self):
-        from ..services.shopify_api import ShopifyAPI
+        Only orders Shopify actually returned are stamped as synced; a batch
+        (or chunk) that failed to fetch stays due for the next cron run.
+        """
+        # Logic: If fulfilled or cancelled in Shopify, remove from Odoo (archive).
+        # fulfillment_status can be: null, fulfilled, partial, restocked;
+        # partial and unfulfilled orders are kept as-is.
+        archive_shopify_ids = {
+            str(order["id"])
+            for order in shopify_data
+            if order.get("fulfillment_status") == "fulfilled" or order.get("cancelled_at")
+        }
+        if archive_shopify_ids:
+            archive_records = batch_records.filtered(lambda r: r.shopify_id in archive_shopify_ids)
+            if archive_records:
+                archive_records.write({"active": False})
 
+        # Stamp last, so a batch whose archive write failed is retried.
+        fetched_ids = {str(order["id"]) for order in shopify_data}
+        fetched_records = batch_records.filtered(lambda r: r.shopify_id in fetched_ids)
+        if fetched_records:
+            fetched_records.write({"last_shopify_sync_at": fields.Datetime.now()})
+
+    def _get_shopify_api(self):
         return ShopifyAPI.from_env(self.env)
 
     def _payload_dict(self):
@@ -664,16 +829,24 @@ class ShopifyOrder(models.Model):
         skipped_lines = []
         sync_rows = []
 
+        # Shopify reads are independent per line, so they run concurrently;
+        # the checks below consume them in line order.
+        baked_goods = _fetch_concurrently(
+            lambda product_id: api.product_has_true_metafield(product_id, "baked_goods"),
+            self.line_ids.mapped("shopify_product_id"),
+            MAX_INVENTORY_LOOKUP_WORKERS,
+        )
+        candidates = []
         for line in self.line_ids:
-            try:
-                if api.product_has_true_metafield(line.shopify_product_id, "baked_goods"):
-                    skipped_lines.append(
-                        f"{self._format_pos_line_for_error(line)}: baked goods product"
-                    )
-                    continue
-            except Exception as exc:  # pylint: disable=broad-except
+            is_baked_goods, exc = baked_goods[line.shopify_product_id]
+            if exc:
                 preflight_errors.append(f"{self._format_pos_line_for_error(line)}: {exc}")
                 continue
+            if is_baked_goods:
+                skipped_lines.append(
+                    f"{self._format_pos_line_for_error(line)}: baked goods product"
+                )
+                continue
 
             if not line.shopify_variant_id:
                 if not line.sku and not line.shopify_product_id:
@@ -697,26 +870,25 @@ class ShopifyOrder(models.Model):
                     f"{self._format_pos_line_for_error(line)}: no matching Odoo product"
                 )
                 continue
+            candidates.append((line, product))
 
-            try:
-                inventory_item_id = api.get_variant_inventory_item_id(line.shopify_variant_id)
-                available_qty = api.get_available_inventory_quantity(
-                    inventory_item_id,
-                    shopify_location_id,
-                )
-            except Exception as exc:  # pylint: disable=broad-except
+        inventory = _fetch_concurrently(
+            lambda key: _fetch_line_inventory(api, key[0], key[1], shopify_location_id),
+            [(line.shopify_variant_id, line.shopify_product_id) for line, _product in candidates],
+            MAX_INVENTORY_LOOKUP_WORKERS,
+        )
+        for line, product in candidates:
+            result, exc = inventory[(line.shopify_variant_id, line.shopify_product_id)]
+            if exc:
                 preflight_errors.append(f"{self._format_pos_line_for_error(line)}: {exc}")
                 continue
 
-            try:
-                restock_metafields = api.get_variant_restock_metafields(
-                    line.shopify_variant_id,
-                    line.shopify_product_id,
-                )
-            except Exception:  # pylint: disable=broad-except
-                _logger.exception(
+            inventory_item_id, available_qty, restock_metafields, restock_error = result
+            if restock_error:
+                _logger.error(
                     "Failed to fetch restock metafields for variant %s; skipping restock check",
                     line.shopify_variant_id,
+                    exc_info=restock_error,
                 )
                 restock_metafields = {"restock_level": None, "desired_inventory_level": None}
 
@@ -943,17 +1115,17 @@ class ShopifyOrder(models.Model):
             return []
 
         api = self._get_shopify_api()
-        rows = []
+        # Shopify reads are independent per line, so they run concurrently;
+        # the checks below consume them in line order.
+        baked_goods = _fetch_concurrently(
+            lambda product_id: api.product_has_true_metafield(product_id, "baked_goods"),
+            self.line_ids.mapped("shopify_product_id"),
+            MAX_INVENTORY_LOOKUP_WORKERS,
+        )
+        candidates = []
         for line in self.line_ids:
-            try:
-                if api.product_has_true_metafield(line.shopify_product_id, "baked_goods"):
-                    _logger.info(
-                        "Order %s line %s skipped for restock detection: baked goods product",
-                        self.order_name,
-                        line.sku or line.title or line.id,
-                    )
-                    continue
-            except Exception as exc:  # pylint: disable=broad-except
+            is_baked_goods, exc = baked_goods[line.shopify_product_id]
+            if exc:
                 _logger.warning(
                     "Order %s line %s restock metafield precheck failed: %s",
                     self.order_name,
@@ -961,6 +1133,13 @@ class ShopifyOrder(models.Model):
                     exc,
                 )
                 continue
+            if is_baked_goods:
+                _logger.info(
+                    "Order %s line %s skipped for restock detection: baked goods product",
+                    self.order_name,
+                    line.sku or line.title or line.id,
+                )
+                continue
 
             sku = (line.sku or "").strip()
             if not line.shopify_variant_id or not sku:
@@ -974,18 +1153,19 @@ class ShopifyOrder(models.Model):
                     sku,
                 )
                 continue
+            candidates.append((line, product, sku))
 
-            try:
-                inventory_item_id = api.get_variant_inventory_item_id(line.shopify_variant_id)
-                available_qty = api.get_available_inventory_quantity(
-                    inventory_item_id,
-                    shopify_location_id,
-                )
-                restock_metafields = api.get_variant_restock_metafields(
-                    line.shopify_variant_id,
-                    line.shopify_product_id,
-                )
-            except Exception as exc:  # pylint: disable=broad-except
+        inventory = _fetch_concurrently(
+            lambda key: _fetch_line_inventory(api, key[0], key[1], shopify_location_id),
+            [(line.shopify_variant_id, line.shopify_product_id) for line, _product, _sku in candidates],
+            MAX_INVENTORY_LOOKUP_WORKERS,
+        )
+        rows = []
+        for line, product, sku in candidates:
+            result, exc = inventory[(line.shopify_variant_id, line.shopify_product_id)]
+            if not exc and result[3]:
+                exc = result[3]
+            if exc:
                 _logger.warning(
                     "Order %s line %s skipped for restock detection: %s",
                     self.order_name,
@@ -994,6 +1174,7 @@ class ShopifyOrder(models.Model):
                 )
                 continue
 
+            inventory_item_id, available_qty, restock_metafields, _restock_error = result
             rows.append({
                 "line": line,
                 "product": product,
@@ -1027,9 +1208,36 @@ class ShopifyOrder(models.Model):
 
     @api.depends("line_ids.weight", "line_ids.quantity")
     def _compute_totals(self):
+        # Bulk recomputes (module install, mass imports) sum in PostgreSQL
+        # instead of walking every line in Python. New (unsaved) records
+        # have no rows to aggregate, so they keep the Python path.
+        if len(self) > BULK_TOTALS_THRESHOLD and all(isinstance(order_id, int) for order_id in self._ids):
+            self.env["shopify.order.line"].flush_model(["order_id", "weight", "quantity"])
+            self.env.cr.execute(
+                """
+                SELECT order_id,
+                       SUM(COALESCE(weight, 0) * COALESCE(quantity, 0)),
+                       SUM(COALESCE(quantity, 0))
+                  FROM shopify_order_line
+                 WHERE order_id IN %s
+              GROUP BY order_id
+                """,
+                (tuple(self._ids),),
+            )
+            totals = {order_id: (weight, items) for order_id, weight, items in self.env.cr.fetchall()}
+            for order in self:
+                total_weight, total_items = totals.get(order.id, (0.0, 0))
+                order.total_weight = total_weight
+                order.total_items = total_items
+            return
+
         for order in self:
-            total_weight = sum((l.weight or 0.0) * (l.quantity or 0) for l in order.line_ids)
-            total_items = sum(l.quantity or 0 for l in order.line_ids)
+            total_weight = 0.0
+            total_items = 0
+            for line in order.line_ids:
+                quantity = line.quantity or 0
+                total_weight += (line.weight or 0.0) * quantity
+                total_items += quantity
             order.total_weight = total_weight
             order.total_items = total_items
 
@@ -1044,9 +1252,45 @@ class ShopifyOrder(models.Model):
                 order.box_count = 1 if order.shipment_id else 0
                 order.is_multi_box = False
 
-    def _refresh_shopify_risk_level(self):
-        """Fetch and persist the current Shopify risk level before fulfillment."""
+    def _bulk_fetch_risk(self) -> dict:
+        """Refresh Shopify risk levels for a batch of orders before processing.
+
+        One bulk GraphQL lookup for the whole batch, persisted with one
+        write per level. Returns {order id: level} for the orders resolved;
+        the rest are looked up individually by _refresh_shopify_risk_level,
+        which keeps the REST fallback and fails closed.
+        """
+        orders = self.filtered(lambda o: o.shopify_id and o.source != "pos")
+        if not orders:
+            return {}
+        try:
+            levels = self._get_shopify_api().get_risk_levels_bulk(orders.mapped("shopify_id"))
+        except Exception:  # pylint: disable=broad-except
+            _logger.exception("Bulk Shopify risk lookup failed; falling back to per-order lookups")
+            return {}
+
+        risk_by_order = {}
+        order_ids_by_level = defaultdict(list)
+        for order in orders:
+            risk = levels.get(order.shopify_id.split("/")[-1])
+            if not risk:
+                continue
+            risk_by_order[order.id] = risk
+            if order.shopify_risk_level != risk:
+                order_ids_by_level[risk].append(order.id)
+        for risk, order_ids in order_ids_by_level.items():
+            self.browse(order_ids).sudo().write({"shopify_risk_level": risk})
+        return risk_by_order
+
+    def _refresh_shopify_risk_level(self, risk: Optional[str] = None):
+        """Fetch and persist the current Shopify risk level before fulfillment.
+
+        ``risk`` is a level already fetched by _bulk_fetch_risk for this
+        processing run; the API is only called when it is not given.
+        """
         self.ensure_one()
+        if risk:
+            return risk
         try:
             api = self._get_shopify_api()
             risk = api.get_risk_level(self.shopify_id)
@@ -1061,7 +1305,8 @@ class ShopifyOrder(models.Model):
                 f"Shopify returned an invalid fraud risk level for order {self.order_name}: {risk}"
             )
 
-        self.sudo().write({"shopify_risk_level": risk})
+        if self.shopify_risk_level != risk:
+            self.sudo().write({"shopify_risk_level": risk})
         return risk
 
     def _is_high_risk(self):
@@ -1088,31 +1333,20 @@ class ShopifyOrder(models.Model):
              _logger.warning("Risk reviewer has no email configured.")
              return
 
-        subject = f"URGENT: High Risk Order Flagged - {self.name_get()[0][1]}"
-        body = f"""
-        <div style="font-family: Arial, sans-serif;">
-            <h2>High Risk Order Detected</h2>
-            <p><strong>Order:</strong> {self.order_name}</p>
-            <p><strong>Shopify Risk Level:</strong> <span style="color: red; font-weight: bold;">{self.shopify_risk_level}</span></p>
-            <p><strong>Customer:</strong> {self.customer_name}</p>
-            <p><strong>Address:</strong><br/>
-               {self.shipping_address_line1}<br/>
-               {self.shipping_address_line2 or ''}<br/>
-               {self.shipping_city}, {self.shipping_state} {self.shipping_zip}
-            </p>
-            <p>This order has been flagged by Shopify as High Risk. Please verify it in Odoo before manual processing.</p>
-            <p><a href="/web#id={self.id}&model=shopify.order&view_type=form">View Order</a></p>
-        </div>
-        """
-        
-        mail_values = {
-            'subject': subject,
-            'body_html': body,
-            'email_to': reviewer.email,
-            'email_from': self.env.user.email_formatted or 'noreply@yourcompany.com',
-        }
+        template = self.env.ref(
+            "shopify_fulfillment.mail_template_high_risk_order",
+            raise_if_not_found=False,
+        )
+        if not template:
+            _logger.warning("High risk order mail template is missing. Skipping notification.")
+            return
+
         try:
-            self.env['mail.mail'].create(mail_values).send()
+            template.send_mail(
+                self.id,
+                force_send=True,
+                email_values={"email_to": reviewer.email},
+            )
             _logger.info("Risk notification sent to %s", reviewer.email)
         except Exception as e:
             _logger.error("Failed to send risk notification: %s", e)
@@ -1134,7 +1368,6 @@ class ShopifyOrder(models.Model):
         payload = {}
         if self.raw_payload:
             try:
-                import json
                 payload = json.loads(self.raw_payload)
             except Exception:
                 pass
@@ -1212,10 +1445,9 @@ class ShopifyOrder(models.Model):
         
         _logger.info("Starting Shopify order sync...")
         
-        # Fetch unfulfilled orders from Shopify
-        shopify_orders = api.get_unfulfilled_orders()
-        _logger.info("Found %d unfulfilled orders in Shopify", len(shopify_orders))
-        
+        # Stream unfulfilled orders from Shopify a page at a time
+        shopify_orders = api.iter_unfulfilled_orders()
+
         imported_count = 0
         pos_synced_count = 0
         skipped_count = 0
@@ -1339,8 +1571,7 @@ class ShopifyOrder(models.Model):
         created_at = False
         if payload.get("created_at"):
             try:
-                from dateutil import parser
-                dt = parser.parse(payload.get("created_at"))
+                dt = dateutil_parser.parse(payload.get("created_at"))
                 created_at = dt.replace(tzinfo=None)
             except Exception:
                 pass
@@ -1359,7 +1590,7 @@ class ShopifyOrder(models.Model):
             "shipping_country": shipping.get("country_code"),
             "shipping_phone": shipping.get("phone"),
             "created_at": created_at,
-            "raw_payload": __import__('json').dumps(payload),
+            "raw_payload": json.dumps(payload),
             "line_ids": line_vals,
             "source": source,
             "requested_shipping_method": requested_method,
@@ -1367,8 +1598,26 @@ class ShopifyOrder(models.Model):
         }
 
     def action_process(self):
-        for order in self:
-            order.process_order()
+        return self._skipped_processing_notification(self.process_order())
+
+    @staticmethod
+    def _skipped_processing_notification(skipped):
+        """Tell the user which orders another worker is already processing."""
+        if not skipped:
+            return None
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "title": "Already Processing",
+                "message": (
+                    "Skipped because another worker is already processing: "
+                    + ", ".join(skipped.mapped("order_name"))
+                ),
+                "type": "warning",
+                "sticky": False,
+            },
+        }
 
     @api.model
     def trigger_queued_processing_cron(self):
@@ -1413,7 +1662,7 @@ class ShopifyOrder(models.Model):
     def action_reset_and_reprocess(self):
         """Reset fulfillment artifacts and re-run processing."""
         self._reset_fulfillment_state()
-        self.process_order()
+        return self._skipped_processing_notification(self.process_order())
 
     def _reset_fulfillment_state(self):
         """Clear shipments/print jobs and return order to pending state."""
@@ -1478,8 +1727,6 @@ class ShopifyOrder(models.Model):
             )
             return
 
-        from odoo.addons.shopify_fulfillment.services.shippo_service import ShippoService
-
         shippo = ShippoService.from_env(self.env)
         if not shippo:
             raise exceptions.UserError(
@@ -1551,8 +1798,23 @@ class ShopifyOrder(models.Model):
             )
 
     def process_order(self):
-        """End-to-end flow: box selection, rate shopping, label purchase, print job."""
-        for order in self:
+        """End-to-end flow: box selection, rate shopping, label purchase, print job.
+
+        Each order's outcome is committed as soon as it is recorded, so
+        label purchases are never lost to a later order's failure.
+
+        Returns the orders skipped because another worker holds their lock.
+        """
+        # One client for the whole batch so its HTTP session is reused.
+        shippo = ShippoService.from_env(self.env)
+
+        orders = self._lock_for_processing()
+        risk_by_order = orders._bulk_fetch_risk()
+
+        # Phase 1 (database): validate, pack and build the Shippo payloads
+        # for every order.
+        plans = []
+        for order in orders:
             try:
                 try:
                     order._run_retail_restock_detection()
@@ -1567,17 +1829,87 @@ class ShopifyOrder(models.Model):
                     order._create_or_update_partner()
                 except Exception as partner_err:
                     _logger.warning("Failed to create partner for order %s during process: %s", order.id, partner_err)
-                
-                order._process_order_inner()
+
+                plan = order._prepare_order_processing(shippo, risk_by_order.get(order.id))
+                if plan:
+                    plans.append((order, plan))
             except Exception as exc:  # pylint: disable=broad-except
                 _logger.exception("Order processing failed for %s", order.id)
                 order.write({"state": "error", "error_message": str(exc)})
 
+        # Phase 2 (network): rate shop and buy labels for the boxes of all
+        # orders on one shared pool instead of one order at a time.
+        shop_results = {}
+        if shippo:
+            tasks = [task for _order, plan in plans for task in plan["rate_shop_tasks"]]
+            shop_results = self._run_rate_shop_tasks(tasks, shippo)
+
+        # Phase 3 (database): record each order's outcome. Its labels are
+        # already paid for, so every order is finished in its own savepoint
+        # and committed straight away: a failure while finishing one order
+        # can then never roll back the purchased labels of another.
+        for order, plan in plans:
+            order_results = {}
+            try:
+                if shippo:
+                    order_results = {
+                        sequence: shop_results[(order.id, sequence)]
+                        for sequence, _packed_box, _box_record in plan["box_jobs"]
+                    }
+                else:
+                    order_results = order._rate_shop_boxes(plan["box_jobs"], None)
+                with self.env.cr.savepoint():
+                    order._finish_order_processing(plan, order_results)
+            except Exception as exc:  # pylint: disable=broad-except
+                _logger.exception("Order processing failed for %s", order.id)
+                order.write({
+                    "state": "error",
+                    "error_message": order._unrecorded_labels_message(exc, order_results),
+                })
+            self.env.cr.commit()
+
+        return self - orders
+
+    @staticmethod
+    def _unrecorded_labels_message(exc, order_results) -> str:
+        """Error message for a failed finish, naming labels bought but not saved."""
+        transaction_ids = [
+            result["shipment_vals"].get("shippo_transaction_id")
+            for result in order_results.values()
+            if isinstance(result, dict) and result.get("shipment_vals")
+        ]
+        transaction_ids = [tid for tid in transaction_ids if tid]
+        if not transaction_ids:
+            return str(exc)
+        return (
+            f"{exc}\nPurchased labels were not recorded; refund them in Shippo: "
+            + ", ".join(transaction_ids)
+        )
+
+    def _lock_for_processing(self):
+        """Row-lock the orders this transaction will process.
+
+        Orders already locked by another worker (cron and a manual button
+        click racing on the same order) are skipped rather than waited on,
+        so a label is never purchased twice for one order.
+        """
+        if not self:
+            return self
+        self.env.cr.execute(
+            "SELECT id FROM shopify_order WHERE id IN %s FOR UPDATE SKIP LOCKED",
+            (tuple(self.ids),),
+        )
+        locked_ids = {row[0] for row in self.env.cr.fetchall()}
+        if len(locked_ids) < len(self):
+            _logger.info(
+                "Skipping %d order(s) already being processed by another worker",
+                len(self) - len(locked_ids),
+            )
+        return self.filtered(lambda order: order.id in locked_ids)
+
     def _send_error_alert(self, title: str, message: str, extra: Optional[dict] = None):
         self.ensure_one()
         try:
-            from odoo.addons.shopify_fulfillment.services.alert_service import AlertService
-
             AlertService.from_env(self.env).notify_error(
                 title=title,
                 message=message,
@@ -1620,7 +1952,15 @@ class ShopifyOrder(models.Model):
 
         return res
 
-    def _process_order_inner(self):
+    def _prepare_order_processing(self, shippo, risk_level: Optional[str] = None) -> Optional[dict]:
+        """Run the database part of processing up to label purchase.
+
+        Handles risk review, weight recovery, reprints and packing. Returns
+        None when the order was fully handled here, otherwise a plan dict
+        with the shipment group, the box jobs and (with Shippo) the
+        rate-shop tasks for _run_rate_shop_tasks. ``risk_level`` is the
+        level prefetched by _bulk_fetch_risk, if any.
+        """
         self.ensure_one()
 
         if self.source == "pos":
@@ -1629,7 +1969,7 @@ class ShopifyOrder(models.Model):
 
         # Step 0: Risk Check
         try:
-            risk_level = self._refresh_shopify_risk_level()
+            risk_level = self._refresh_shopify_risk_level(risk_level)
         except exceptions.UserError as exc:
             self.write({
                 "state": "manual_required",
@@ -1650,38 +1990,43 @@ class ShopifyOrder(models.Model):
             raise exceptions.UserError("Order has no line items")
 
         # Auto-recover missing weights from Shopify
-        if any(l.requires_shipping and not l.weight for l in self.line_ids):
+        missing_weight_lines = self.line_ids.filtered(lambda l: l.requires_shipping and not l.weight)
+        if missing_weight_lines:
             api_client = self._get_shopify_api()
-            fixed_count = 0
-            for line in self.line_ids:
-                if line.requires_shipping and not line.weight:
-                    _logger.info("Validation: Line has 0 weight. Fetching details for Line %s...", line.id)
-
-                    variant = None
-                    # Strategy 1: Use Variant ID if exists
-                    if line.shopify_variant_id:
-                        variant = api_client.get_product_variant(line.shopify_variant_id)
-                        if variant:
-                            weight_g = variant.get("grams") or 0.0
-                            if weight_g:
-                                line.write({"weight": weight_g})
-                                fixed_count += 1
-                                continue  # Success, move to next line
-
-                    # Strategy 2: If failed or no ID, lookup by SKU
-                    if line.sku:
-                        _logger.info("Validation: Fetching weight by SKU %s match...", line.sku)
-                        weight_g = api_client.get_weight_by_sku(line.sku)
-                        if weight_g:
-                            _logger.info("Found weight by SKU: %s", weight_g)
-                            line.write({"weight": weight_g})
-                            fixed_count += 1
-
-            if fixed_count > 0:
-                self._compute_totals()  # Force recompute
-
-        # Basic validation: weights present (check again after recovery attempt)
-        if any(l.requires_shipping and not l.weight for l in self.line_ids):
+            _logger.info(
+                "Validation: %d line(s) have 0 weight. Fetching details for Lines %s...",
+                len(missing_weight_lines),
+                missing_weight_lines.ids,
+            )
+
+            # Look up every line by variant ID and by SKU in one bulk query.
+            grams_by_variant, grams_by_sku = api_client.get_variant_weights_bulk(
+                variant_ids=[l.shopify_variant_id for l in missing_weight_lines if l.shopify_variant_id],
+                skus=[l.sku for l in missing_weight_lines if l.sku],
+            )
+
+            line_ids_by_weight = defaultdict(list)
+            for line in missing_weight_lines:
+                # Strategy 1: Variant ID
+                weight_g = grams_by_variant.get(str(line.shopify_variant_id or ""))
+
+                # Strategy 2: If failed or no ID, match by SKU
+                if not weight_g and line.sku:
+                    weight_g = grams_by_sku.get(line.sku.lower())
+                    if weight_g:
+                        _logger.info("Found weight by SKU %s: %s", line.sku, weight_g)
+
+                if weight_g:
+                    line_ids_by_weight[weight_g].append(line.id)
+
+            # One write per distinct weight; totals recompute via @api.depends.
+            OrderLine = self.env["shopify.order.line"]
+            for weight_g, line_ids in line_ids_by_weight.items():
+                OrderLine.browse(line_ids).write({"weight": weight_g})
+
+        # Basic validation: weights present (check again after recovery attempt).
+        # Only the lines that were missing a weight can still be missing one.
+        if any(not l.weight for l in missing_weight_lines):
             self.write({"state": "manual_required", "error_message": "Missing weight on one or more items (Fetch failed)"})
             return
 
@@ -1775,88 +2120,118 @@ class ShopifyOrder(models.Model):
             return
 
         # Create shipment group
+        # The group is linked to the order in the same write that records the
+        # outcome below (success or error), not with a separate UPDATE now.
         group = self.env["fulfillment.shipment.group"].create({
             "order_id": self.id,
         })
-        self.shipment_group_id = group.id
 
-        # Import Shippo service
-        from odoo.addons.shopify_fulfillment.services.shippo_service import ShippoService
-        shippo = ShippoService.from_env(self.env)
+        box_jobs = [
+            (
+                sequence,
+                packed_box,
+                self.env["fulfillment.box"].browse(packed_box.box_spec.box_id),
+            )
+            for sequence, packed_box in enumerate(packing_result.packed_boxes, start=1)
+        ]
+        return {
+            "group": group,
+            "box_jobs": box_jobs,
+            "rate_shop_tasks": self._prepare_rate_shop_tasks(box_jobs, shippo) if shippo else [],
+        }
+
+    def _finish_order_processing(self, plan: dict, shop_results: dict):
+        """Persist the rate-shop results for a plan from _prepare_order_processing.
 
-        # Process each packed box
-        shipments_created = []
-        for sequence, packed_box in enumerate(packing_result.packed_boxes, start=1):
+        Args:
+            plan: dict returned by _prepare_order_processing
+            shop_results: dict mapping box sequence to the _rate_shop_box
+                result, or to the exception raised for that box
+        """
+        self.ensure_one()
+        group = plan["group"]
+        box_jobs = plan["box_jobs"]
+
+        # Persist every purchased label, even when another box failed, so the
+        # reprocess path can find and refund it.
+        purchased_boxes = []
+        failure = None
+        for sequence, packed_box, box_record in box_jobs:
             try:
-                shipment = self._process_single_box(
-                    packed_box=packed_box,
-                    group=group,
-                    sequence=sequence,
-                    shippo=shippo
-                )
-                if shipment:
-                    shipments_created.append(shipment)
+                result = shop_results[sequence]
+                if isinstance(result, Exception):
+                    raise result
+                purchased_boxes.append((
+                    sequence,
+                    packed_box,
+                    result,
+                    self._prepare_box_shipment_vals(
+                        packed_box=packed_box,
+                        group=group,
+                        sequence=sequence,
+                        box_record=box_record,
+                        shop_result=result,
+                    ),
+                ))
             except Exception as e:
                 _logger.exception("Failed to process box %d for order %s", sequence, self.id)
-                group.write({"state": "error"})
-                self.write({
-                    "state": "error",
-                    "error_message": f"Box {sequence} failed: {str(e)}"
-                })
-                return
+                if failure is None:
+                    failure = (sequence, e)
+        shipments_created = self._create_box_shipments(group, purchased_boxes)
+
+        if failure:
+            sequence, e = failure
+            group.write({"state": "error"})
+            # Keep the group linked so a reset/reprocess refunds its labels.
+            self.write({
+                "shipment_group_id": group.id,
+                "state": "error",
+                "error_message": f"Box {sequence} failed: {str(e)}"
+            })
+            return
 
         # Update group state
         group.write({"state": "complete"})
 
+        # Link the group and, for backward compatibility, the first shipment
+        # and box, together with the final state in a single write.
+        final_vals = {"shipment_group_id": group.id, "state": "ready_to_ship"}
+        if shipments_created:
+            final_vals["shipment_id"] = shipments_created[0].id
+            final_vals["box_id"] = shipments_created[0].box_id.id
+        self.write(final_vals)
+
         # Queue print jobs only after every box purchased successfully, so a
         # mid-run failure never prints labels for a partially processed order.
-        for shipment in shipments_created:
-            self.env["print.job"].create({
-                "order_id": self.id,
-                "shipment_id": shipment.id,
-                "job_type": "label",
-                "zpl_data": shipment.label_zpl or "",
-                "printer_id": False,
-            })
-
-        # Backward compatibility: set shipment_id and box_id to first shipment
         if shipments_created:
-            self.shipment_id = shipments_created[0].id
-            self.box_id = shipments_created[0].box_id.id
+            self.env["print.job"].create([
+                {
+                    "order_id": self.id,
+                    "shipment_id": shipment.id,
+                    "job_type": "label",
+                    "zpl_data": shipment.label_zpl or "",
+                    "printer_id": False,
+                }
+                for shipment in shipments_created
+            ])
 
         _logger.info("Order %s: Created %d shipments (multi-box)", self.id, len(shipments_created))
-        self.write({"state": "ready_to_ship"})
 
     def _pack_order_multi_box(self):
         """Run multi-box packing algorithm.
 
         Returns a PackingResult with packed_boxes list.
         """
-        from odoo.addons.shopify_fulfillment.services.multi_box_packer import (
-            MultiBoxPacker,
-            PackingResult,
-        )
+        # Without weighted lines the packer has nothing to place; skip the
+        # box lookup entirely.
+        if not self.total_weight:
+            return PackingResult(success=False, error_message="No items to pack")
 
-        boxes = self.env["fulfillment.box"].search([("active", "=", True)])
-        if not boxes:
+        box_specs = self.env["fulfillment.box"]._get_active_boxes_data()
+        if not box_specs:
             return PackingResult(success=False, error_message="No active boxes configured")
 
-        boxes_data = [
-            {
-                "id": b.id,
-                "name": b.name,
-                "length": b.length,
-                "width": b.width,
-                "height": b.height,
-                "max_weight": b.max_weight,
-                "box_weight": b.box_weight,
-                "volume": b.volume,
-                "priority": b.priority,
-            }
-            for b in boxes
-        ]
-
-        packer = MultiBoxPacker.from_order(self, boxes_data)
+        packer = MultiBoxPacker.from_order(self, box_specs)
         result = packer.pack()
 
         _logger.info(
@@ -1867,140 +2242,251 @@ class ShopifyOrder(models.Model):
         )
         return result
 
-    def _process_single_box(self, packed_box, group, sequence: int, shippo) -> Optional[models.Model]:
-        """Process a single box: rate shop, purchase label, create shipment, print job.
+    def _excluded_service_terms(self) -> list:
+        """Shipping service substrings excluded from rate selection."""
+        excluded_raw = self.env["ir.config_parameter"].sudo().get_param(
+            "fulfillment.excluded_services", "ground saver"
+        )
+        return [
+            term.strip().lower()
+            for term in (excluded_raw or "").split(",")
+            if term.strip()
+        ]
+
+    def _rate_shop_boxes(self, box_jobs, shippo) -> dict:
+        """Fetch rates and buy a label for each packed box of this order.
 
         Args:
-            packed_box: PackedBox instance from packer
-            group: fulfillment.shipment.group record
-            sequence: Box number (1, 2, 3...)
-            shippo: ShippoService instance
+            box_jobs: list of (sequence, PackedBox, fulfillment.box record)
+            shippo: ShippoService instance or None
 
         Returns:
-            fulfillment.shipment record or None
+            dict mapping sequence to the _rate_shop_box result, or to the
+            exception raised while processing that box
         """
-        box_record = self.env["fulfillment.box"].browse(packed_box.box_spec.box_id)
-        line_ids = packed_box.line_ids
+        if not shippo:
+            results = {}
+            for sequence, _packed_box, _box_record in box_jobs:
+                try:
+                    results[sequence] = self._rate_shop_box_mock(sequence)
+                except Exception as exc:  # pylint: disable=broad-except
+                    results[sequence] = exc
+            return results
 
-        _logger.info(
-            "Order %s: Processing box %d (%s) - %.0fg, %d items",
-            self.id,
-            sequence,
-            box_record.name,
-            packed_box.total_weight_with_box,
-            len(packed_box.items),
-        )
+        results = self._run_rate_shop_tasks(self._prepare_rate_shop_tasks(box_jobs, shippo), shippo)
+        return {sequence: results[(self.id, sequence)] for sequence, _packed_box, _box_record in box_jobs}
 
-        shipment_vals = None
+    def _prepare_rate_shop_tasks(self, box_jobs, shippo) -> list:
+        """Build the Shippo work for each packed box of this order.
 
-        shippo_meta = {"is_residential": None, "validation_results": None}
+        Everything the worker threads need is read from the database here,
+        because the ORM cursor must only be used by this thread.
 
-        if shippo:
-            # Get rates for this specific box with its weight
-            rates, shippo_meta = shippo.get_rates_for_box(
+        Returns:
+            list of (order, sequence, payload, box name, excluded terms,
+            selection context) tuples for _run_rate_shop_tasks
+        """
+        sender_company = self.env.company
+        excluded_terms = self._excluded_service_terms()
+        selection_ctx = self._shipping_selection_context()
+        # Both addresses are the same for every box of the order.
+        address_to = shippo.build_address_to(self)
+        address_from = shippo.build_address_from(sender_company)
+        tasks = []
+        for sequence, packed_box, box_record in box_jobs:
+            _logger.info(
+                "Order %s: Processing box %d (%s) - %.0fg, %d items",
+                self.id,
+                sequence,
+                box_record.name,
+                packed_box.total_weight_with_box,
+                len(packed_box.items),
+            )
+            payload = shippo.build_box_shipment_payload(
                 order=self,
                 box=box_record,
                 total_weight_grams=packed_box.total_weight_with_box,
-                sender_company=self.env.company,
+                sender_company=sender_company,
+                address_to=address_to,
+                address_from=address_from,
             )
+            tasks.append((self, sequence, payload, box_record.name, excluded_terms, selection_ctx))
+        return tasks
+
+    @api.model
+    def _run_rate_shop_tasks(self, tasks, shippo) -> dict:
+        """Run rate-shop tasks, possibly from several orders, on a thread pool.
+
+        Returns:
+            dict mapping (order id, sequence) to the _rate_shop_box result,
+            or to the exception raised while processing that box
+        """
+        results = {}
+        if not tasks:
+            return results
+        workers = min(len(tasks), MAX_RATE_SHOP_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(
+                    order._rate_shop_box,
+                    payload=payload,
+                    box_name=box_name,
+                    sequence=sequence,
+                    shippo=shippo,
+                    excluded_terms=excluded_terms,
+                    selection_ctx=selection_ctx,
+                ): (order.id, sequence)
+                for order, sequence, payload, box_name, excluded_terms, selection_ctx in tasks
+            }
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    results[key] = future.result()
+                except Exception as exc:  # pylint: disable=broad-except
+                    results[key] = exc
+        return results
+
+    def _rate_shop_box(self, payload, box_name, sequence: int, shippo, excluded_terms, selection_ctx) -> dict:
+        """Rate shop and purchase a label for one box through Shippo.
+
+        Runs on a worker thread: it only performs HTTP calls and must not
+        read or write records.
 
-            # Filter out excluded shipping services (comma-separated substrings)
-            excluded_raw = self.env["ir.config_parameter"].sudo().get_param(
-                "fulfillment.excluded_services", "ground saver"
+        Returns:
+            dict with rates, shippo_meta, selected_rate and shipment_vals
+        """
+        rates, shippo_meta = shippo.get_rates_for_payload(
+            payload,
+            order_id=self.id,
+            box_name=box_name,
+        )
+
+        # Filter out excluded shipping services (comma-separated substrings)
+        # and track the cheapest remaining rate in the same pass.
+        original_count = len(rates)
+        kept_rates = []
+        cheapest_rate = None
+        cheapest_amount = float("inf")
+        for r in rates:
+            service_name = (r.get("servicelevel", {}).get("name") or "").lower()
+            if any(term in service_name for term in excluded_terms):
+                continue
+            kept_rates.append(r)
+            amount = self._rate_amount(r)
+            if amount < cheapest_amount:
+                cheapest_rate, cheapest_amount = r, amount
+        rates = kept_rates
+        if original_count != len(rates):
+            _logger.info(
+                "Order %s Box %d: Filtered out %d excluded services",
+                self.id,
+                sequence,
+                original_count - len(rates),
             )
-            excluded_terms = [
-                term.strip().lower()
-                for term in (excluded_raw or "").split(",")
-                if term.strip()
-            ]
-            original_count = len(rates)
-            rates = [
-                r
-                for r in rates
-                if not any(
-                    term in (r.get("servicelevel", {}).get("name") or "").lower()
-                    for term in excluded_terms
-                )
-            ]
-            if original_count != len(rates):
-                _logger.info(
-                    "Order %s Box %d: Filtered out %d excluded services",
-                    self.id,
-                    sequence,
-                    original_count - len(rates),
-                )
 
-            if not rates:
-                raise exceptions.UserError(
-                    f"Box {sequence}: Shippo returned no rates (Check address/credentials)"
+        if not rates:
+            raise exceptions.UserError(
+                f"Box {sequence}: Shippo returned no rates (Check address/credentials)"
+            )
+
+        # Select rate: the requested method when there is one, else the
+        # cheapest found above.
+        if selection_ctx["requested"]:
+            selected_rate = self._select_shipping_rate(rates, selection_ctx)
+        else:
+            selected_rate = cheapest_rate
+        shipment_vals = shippo.purchase_label(selected_rate)
+
+        # Carrier fallback: If USPS fails with address validation, try UPS
+        if shipment_vals and shipment_vals.get("error"):
+            error_codes = shipment_vals.get("error_codes", [])
+            failed_carrier = shipment_vals.get("failed_carrier", "")
+
+            # Check if this is an address validation error from USPS
+            is_address_error = "failed_address_validation" in error_codes
+            is_usps = failed_carrier.upper() == "USPS" or "USPS" in selected_rate.get("provider", "")
+
+            if is_address_error and is_usps:
+                _logger.warning(
+                    "Order %s Box %d: USPS address validation failed, attempting UPS fallback",
+                    self.id, sequence
                 )
 
-            # Select rate (cheapest or requested method)
-            selected_rate = self._select_shipping_rate(rates)
-            shipment_vals = shippo.purchase_label(selected_rate)
-            
-            # Carrier fallback: If USPS fails with address validation, try UPS
-            if shipment_vals and shipment_vals.get("error"):
-                error_codes = shipment_vals.get("error_codes", [])
-                failed_carrier = shipment_vals.get("failed_carrier", "")
-                
-                # Check if this is an address validation error from USPS
-                is_address_error = "failed_address_validation" in error_codes
-                is_usps = failed_carrier.upper() == "USPS" or "USPS" in selected_rate.get("provider", "")
-                
-                if is_address_error and is_usps:
-                    _logger.warning(
-                        "Order %s Box %d: USPS address validation failed, attempting UPS fallback",
-                        self.id, sequence
+                # Find a UPS rate as fallback
+                ups_rates = [
+                    r for r in rates
+                    if r.get("provider", "").upper() == "UPS"
+                ]
+
+                if ups_rates:
+                    # Re-run selector so expedited requests cannot downgrade on carrier fallback.
+                    ups_rate = self._select_shipping_rate(ups_rates, selection_ctx)
+                    _logger.info(
+                        "Order %s Box %d: Trying UPS %s at $%s",
+                        self.id, sequence,
+                        ups_rate.get("servicelevel", {}).get("name"),
+                        ups_rate.get("amount")
                     )
-                    
-                    # Find a UPS rate as fallback
-                    ups_rates = [
-                        r for r in rates 
-                        if r.get("provider", "").upper() == "UPS"
-                    ]
-                    
-                    if ups_rates:
-                        # Re-run selector so expedited requests cannot downgrade on carrier fallback.
-                        ups_rate = self._select_shipping_rate(ups_rates)
-                        _logger.info(
-                            "Order %s Box %d: Trying UPS %s at $%s",
-                            self.id, sequence,
-                            ups_rate.get("servicelevel", {}).get("name"),
-                            ups_rate.get("amount")
-                        )
-                        shipment_vals = shippo.purchase_label(ups_rate)
+                    shipment_vals = shippo.purchase_label(ups_rate)
 
-                        if shipment_vals and not shipment_vals.get("error"):
-                            selected_rate = ups_rate
-                            _logger.info(
-                                "Order %s Box %d: UPS fallback successful!",
-                                self.id, sequence
-                            )
-                    else:
-                        _logger.warning(
-                            "Order %s Box %d: No UPS rates available for fallback",
+                    if shipment_vals and not shipment_vals.get("error"):
+                        selected_rate = ups_rate
+                        _logger.info(
+                            "Order %s Box %d: UPS fallback successful!",
                             self.id, sequence
                         )
-        else:
-            # No Shippo key configured. Only fall back to the mock API when
-            # explicitly enabled for testing; otherwise stop rather than
-            # "shipping" with fake labels and fake tracking numbers.
-            allow_mock = self.env["ir.config_parameter"].sudo().get_param(
-                "fulfillment.allow_mock_api", "False"
+                else:
+                    _logger.warning(
+                        "Order %s Box %d: No UPS rates available for fallback",
+                        self.id, sequence
+                    )
+
+        return {
+            "rates": rates,
+            "shippo_meta": shippo_meta,
+            "selected_rate": selected_rate,
+            "shipment_vals": shipment_vals,
+        }
+
+    def _rate_shop_box_mock(self, sequence: int) -> dict:
+        """Mock-API counterpart of _rate_shop_box (testing only)."""
+        # No Shippo key configured. Only fall back to the mock API when
+        # explicitly enabled for testing; otherwise stop rather than
+        # "shipping" with fake labels and fake tracking numbers.
+        allow_mock = self.env["ir.config_parameter"].sudo().get_param(
+            "fulfillment.allow_mock_api", "False"
+        )
+        if allow_mock.lower() not in ("true", "1", "yes"):
+            raise exceptions.UserError(
+                f"Box {sequence}: Shippo API key is not configured. Set "
+                "shippo.api_key (or enable fulfillment.allow_mock_api for testing)."
             )
-            if allow_mock.lower() not in ("true", "1", "yes"):
-                raise exceptions.UserError(
-                    f"Box {sequence}: Shippo API key is not configured. Set "
-                    "shippo.api_key (or enable fulfillment.allow_mock_api for testing)."
-                )
-            api_client = self._get_shopify_api()
-            rates = api_client.get_shipping_rates(self)
-            if not rates:
-                raise exceptions.UserError(f"Box {sequence}: Mock API returned no rates")
-            cheapest = sorted(rates, key=lambda r: r.get("amount", 0))[0]
-            selected_rate = cheapest
-            shipment_vals = api_client.purchase_label(self, cheapest.get("id"))
+        api_client = self._get_shopify_api()
+        rates = api_client.get_shipping_rates(self)
+        if not rates:
+            raise exceptions.UserError(f"Box {sequence}: Mock API returned no rates")
+        cheapest = min(rates, key=lambda r: r.get("amount", 0))
+        return {
+            "rates": rates,
+            "shippo_meta": None,
+            "selected_rate": cheapest,
+            "shipment_vals": api_client.purchase_label(self, cheapest.get("id")),
+        }
+
+    def _prepare_box_shipment_vals(self, packed_box, group, sequence: int, box_record, shop_result) -> dict:
+        """Build fulfillment.shipment values for one purchased box.
+
+        Args:
+            packed_box: PackedBox instance from packer
+            group: fulfillment.shipment.group record
+            sequence: Box number (1, 2, 3...)
+            box_record: fulfillment.box record used for the box
+            shop_result: dict returned by _rate_shop_box / _rate_shop_box_mock
+
+        Returns:
+            dict of values for fulfillment.shipment.create()
+        """
+        shipment_vals = shop_result["shipment_vals"]
 
         if not shipment_vals:
             raise exceptions.UserError(f"Box {sequence}: Label purchase failed (unknown error)")
@@ -2008,15 +2494,15 @@ class ShopifyOrder(models.Model):
         if shipment_vals.get("error"):
             raise exceptions.UserError(f"Box {sequence}: {shipment_vals['error']}")
 
-        # Create shipment record. Per-line unit counts are persisted so the
-        # Shopify fulfillment push can attach each box's tracking number to
-        # exactly the items that shipped in that box.
-        shipment = self.env["fulfillment.shipment"].create({
+        # Per-line unit counts are persisted so the Shopify fulfillment push
+        # can attach each box's tracking number to exactly the items that
+        # shipped in that box.
+        return {
             "order_id": self.id,
             "group_id": group.id,
             "box_id": box_record.id,
             "sequence": sequence,
-            "line_ids": [(6, 0, line_ids)],
+            "line_ids": [(6, 0, packed_box.line_ids)],
             "line_quantities": json.dumps(packed_box.line_quantities),
             "total_weight": packed_box.total_weight_with_box,
             "shippo_transaction_id": shipment_vals.get("shippo_transaction_id"),
@@ -2029,63 +2515,69 @@ class ShopifyOrder(models.Model):
             "rate_amount": shipment_vals.get("rate_amount"),
             "rate_currency": shipment_vals.get("rate_currency"),
             "purchased_at": fields.Datetime.now(),
-        })
+        }
 
-        # Log rate audit row (top-3 cheapest vs. selected) for weekly review.
-        try:
-            self.env["fulfillment.rate.audit"].sudo().log_purchase(
-                order=self,
-                shipment=shipment,
-                group=group,
-                sequence=sequence,
-                weight_grams=packed_box.total_weight_with_box,
-                rates=rates,
-                selected_rate=selected_rate,
-                is_residential=shippo_meta.get("is_residential") if shippo else None,
-            )
-        except Exception:
-            _logger.exception(
-                "Order %s Box %d: Failed to write rate audit row (continuing)",
+    def _create_box_shipments(self, group, purchased_boxes) -> models.Model:
+        """Create the shipments for all purchased boxes in one batch.
+
+        Args:
+            group: fulfillment.shipment.group record
+            purchased_boxes: list of (sequence, packed_box, shop_result,
+                shipment values) tuples, in box order
+
+        Returns:
+            fulfillment.shipment recordset, in the same order
+        """
+        if not purchased_boxes:
+            return self.env["fulfillment.shipment"]
+
+        shipments = self.env["fulfillment.shipment"].create(
+            [shipment_vals for _sequence, _packed_box, _result, shipment_vals in purchased_boxes]
+        )
+        for shipment, (sequence, packed_box, shop_result, _vals) in zip(shipments, purchased_boxes):
+            shippo_meta = shop_result["shippo_meta"]
+            # Log rate audit row (top-3 cheapest vs. selected) for weekly review.
+            try:
+                self.env["fulfillment.rate.audit"].sudo().log_purchase(
+                    order=self,
+                    shipment=shipment,
+                    group=group,
+                    sequence=sequence,
+                    weight_grams=packed_box.total_weight_with_box,
+                    rates=shop_result["rates"],
+                    selected_rate=shop_result["selected_rate"],
+                    is_residential=shippo_meta.get("is_residential") if shippo_meta else None,
+                )
+            except Exception:
+                _logger.exception(
+                    "Order %s Box %d: Failed to write rate audit row (continuing)",
+                    self.id,
+                    sequence,
+                )
+
+            _logger.info(
+                "Order %s Box %d: Shipment created - %s %s",
                 self.id,
                 sequence,
+                shipment.tracking_number,
+                shipment.carrier,
             )
-
-        _logger.info(
-            "Order %s Box %d: Shipment created - %s %s",
-            self.id,
-            sequence,
-            shipment.tracking_number,
-            shipment.carrier,
-        )
-        return shipment
+        return shipments
 
     @staticmethod
     def _normalize_shipping_text(value: str) -> str:
         if not value:
             return ""
-        normalized = unicodedata.normalize("NFKD", value)
-        normalized = normalized.encode("ascii", "ignore").decode("ascii")
-        normalized = normalized.lower()
-        normalized = re.sub(r"[^a-z0-9]+", " ", normalized)
-        return re.sub(r"\s+", " ", normalized).strip()
+        return _normalize_shipping_text_cached(value)
 
     @classmethod
     def _shipping_speed_class(cls, normalized_value: str) -> Optional[str]:
         if not normalized_value:
             return None
 
-        if re.search(r"\b(overnight|next day|nextday|1 day|one day|priority overnight|first overnight)\b", normalized_value):
-            return "overnight"
-        if re.search(r"\b(2 day|two day|2nd day|second day|48 hour)\b", normalized_value):
-            return "two_day"
-        if re.search(r"\b(3 day|three day|3rd day|third day|72 hour)\b", normalized_value):
-            return "three_day"
-        if re.search(r"\b(express|expedited|rush)\b", normalized_value):
-            return "expedited"
-        if re.search(r"\b(priority)\b", normalized_value):
-            return "expedited"
-        if re.search(r"\b(ground|standard|economy|saver|surepost|smartpost)\b", normalized_value):
-            return "ground"
+        for pattern, speed_class in SHIPPING_SPEED_PATTERNS:
+            if pattern.search(normalized_value):
+                return speed_class
         return None
 
     @staticmethod
@@ -2172,7 +2664,14 @@ class ShopifyOrder(models.Model):
                 return self._normalize_shipping_text(str(value)) or None
         return None
 
-    def _requested_shipping_context(self) -> dict:
+    @api.depends("requested_shipping_method", "raw_payload")
+    def _compute_requested_shipping_method_norm(self):
+        # Stored so rate selection doesn't re-parse the raw payload JSON
+        # every time an order is processed.
+        for order in self:
+            order.requested_shipping_method_norm = order._normalized_requested_shipping()
+
+    def _normalized_requested_shipping(self) -> str:
         snippets = [self.requested_shipping_method or ""]
         if self.raw_payload:
             try:
@@ -2191,36 +2690,65 @@ class ShopifyOrder(models.Model):
                 )
 
         merged = " ".join(s for s in snippets if s).strip()
-        normalized = self._normalize_shipping_text(merged)
+        return self._normalize_shipping_text(merged)
+
+    def _requested_shipping_context(self) -> dict:
+        normalized = self.requested_shipping_method_norm or ""
         speed_class = self._shipping_speed_class(normalized)
         return {
-            "raw": merged,
             "normalized": normalized,
             "speed_class": speed_class,
             "provider_hint": self._shipping_provider_hint(normalized),
             "is_expedited": self._is_expedited_request(normalized, speed_class),
         }
 
-    def _select_shipping_rate(self, rates: list) -> dict:
+    def _shipping_selection_context(self) -> dict:
+        """Read the order-side inputs of _select_shipping_rate up front.
+
+        Lets rate selection run without touching the database, e.g. from the
+        worker threads used for multi-box rate shopping.
+        """
+        self.ensure_one()
+        requested = self.requested_shipping_method or ""
+        if not requested:
+            return {"requested": ""}
+        req_ctx = self._requested_shipping_context()
+        return {
+            "requested": requested,
+            "req_ctx": req_ctx,
+            "mapped_target": self._configured_shipping_method_target(req_ctx["normalized"]),
+        }
+
+    @staticmethod
+    def _rate_amount(rate: dict) -> float:
+        """Rate price as a float; unparseable amounts sort last."""
+        try:
+            return float(rate.get("amount", 999999))
+        except Exception:
+            return 999999.0
+
+    def _select_shipping_rate(self, rates: list, selection_ctx: Optional[dict] = None) -> dict:
         """Select the best shipping rate from available options.
 
         Prefers requested_shipping_method if set, otherwise cheapest.
+        selection_ctx is the result of _shipping_selection_context(); it is
+        computed on demand when not given.
         """
         if not rates:
             return {}
+        if selection_ctx is None:
+            selection_ctx = self._shipping_selection_context()
+        requested = selection_ctx["requested"]
+        _rate_amount = self._rate_amount
 
-        def _rate_amount(rate):
-            try:
-                return float(rate.get("amount", 999999))
-            except Exception:
-                return 999999.0
+        def _item_amount(item):
+            return item["amount"]
 
-        # Sort by amount (cheapest first)
-        cheapest = sorted(rates, key=_rate_amount)[0]
-        selected_rate = cheapest
+        # Cheapest rate in a single pass
+        selected_rate = min(rates, key=_rate_amount)
 
-        if self.requested_shipping_method:
-            req_ctx = self._requested_shipping_context()
+        if requested:
+            req_ctx = selection_ctx["req_ctx"]
             req_norm = req_ctx["normalized"]
             req_speed = req_ctx["speed_class"]
             req_provider = req_ctx["provider_hint"]
@@ -2243,9 +2771,10 @@ class ShopifyOrder(models.Model):
 
             provider_rates = []
             if req_provider:
+                req_provider_norm = self._normalize_shipping_text(req_provider)
                 provider_rates = [
                     item for item in enriched_rates
-                    if self._normalize_shipping_text(req_provider) in item["provider"]
+                    if req_provider_norm in item["provider"]
                 ]
 
             candidate_pool = provider_rates or enriched_rates
@@ -2254,7 +2783,7 @@ class ShopifyOrder(models.Model):
             # (fulfillment.shipping_method_map), so known shipping options
             # resolve deterministically without fuzzy matching.
             mapped_matches = []
-            mapped_target = self._configured_shipping_method_target(req_norm)
+            mapped_target = selection_ctx["mapped_target"]
             if mapped_target:
                 mapped_matches = [
                     item for item in candidate_pool
@@ -2276,9 +2805,9 @@ class ShopifyOrder(models.Model):
                 if item["service"] == req_norm or item["combined"] == req_norm
             ]
             if mapped_matches:
-                selected_rate = sorted(mapped_matches, key=lambda item: item["amount"])[0]["rate"]
+                selected_rate = min(mapped_matches, key=_item_amount)["rate"]
             elif exact_matches:
-                selected_rate = sorted(exact_matches, key=lambda item: item["amount"])[0]["rate"]
+                selected_rate = min(exact_matches, key=_item_amount)["rate"]
             else:
                 # Next best: phrase containment.
                 contains_matches = [
@@ -2289,7 +2818,7 @@ class ShopifyOrder(models.Model):
                     )
                 ]
                 if contains_matches:
-                    selected_rate = sorted(contains_matches, key=lambda item: item["amount"])[0]["rate"]
+                    selected_rate = min(contains_matches, key=_item_amount)["rate"]
                 else:
                     # Then speed-class match (overnight, 2-day, etc).
                     speed_matches = [
@@ -2297,7 +2826,7 @@ class ShopifyOrder(models.Model):
                         if self._is_speed_compatible(req_speed, item["speed_class"])
                     ]
                     if speed_matches:
-                        selected_rate = sorted(speed_matches, key=lambda item: item["amount"])[0]["rate"]
+                        selected_rate = min(speed_matches, key=_item_amount)["rate"]
                     else:
                         # Last attempt: fuzzy token overlap between requested phrase and rate name.
                         scored = [
@@ -2308,7 +2837,7 @@ class ShopifyOrder(models.Model):
                         if scored:
                             top_score = max(pair[0] for pair in scored)
                             top_matches = [pair[1] for pair in scored if pair[0] == top_score]
-                            selected_rate = sorted(top_matches, key=lambda item: item["amount"])[0]["rate"]
+                            selected_rate = min(top_matches, key=_item_amount)["rate"]
                         elif req_ctx["is_expedited"]:
                             available = ", ".join(
                                 sorted({
@@ -2319,20 +2848,20 @@ class ShopifyOrder(models.Model):
                             raise exceptions.UserError(
                                 "Requested shipping method '%s' could not be matched to an expedited Shippo "
                                 "rate. Available rates: %s. Order held to prevent a slower label purchase."
-                                % (self.requested_shipping_method, available)
+                                % (requested, available)
                             )
                         else:
                             _logger.warning(
                                 "Order %s: Requested shipping '%s' not found. Using cheapest.",
                                 self.id,
-                                self.requested_shipping_method,
+                                requested,
                             )
 
             if selected_rate:
                 _logger.info(
                     "Order %s: Selected rate for '%s': %s (%s) - $%s",
                     self.id,
-                    self.requested_shipping_method,
+                    requested,
                     selected_rate.get("servicelevel", {}).get("name"),
                     selected_rate.get("provider"),
                     selected_rate.get("amount"),
@@ -0,0 +1,99 @@
+"""Shared HTTP session setup for the Shopify and Shippo clients."""
+
+import atexit
+import json
+import threading
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:  # optional speedup; the stdlib codec is used without it
+    orjson = None
+
+TRANSIENT_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Shared clients kept per ClientRegistry.
+CLIENT_CACHE_SIZE = 8
+
+# Seconds to wait for the TCP/TLS handshake. Pass as the first element of a
+# (connect, read) timeout so an unreachable host fails fast while slow
+# responses still get the full read budget.
+CONNECT_TIMEOUT = 5
+
+
+def build_session(pool_maxsize: int = 10) -> requests.Session:
+    """Return a keep-alive session with a sized pool and transient retries.
+
+    urllib3 only retries idempotent methods (GET, HEAD, PUT, DELETE, ...);
+    POSTs are never replayed, since a repeated label purchase or
+    fulfillment create would be billed or applied twice. When retries run
+    out the last response is returned so callers keep their own status
+    handling.
+    """
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=TRANSIENT_STATUS_CODES,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def json_dumps(payload) -> bytes:
+    """Encode a request body as UTF-8 JSON, with orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload).encode("utf-8")
+
+
+def json_loads(content):
+    """Decode a JSON response body (bytes or str), with orjson when installed."""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+class ClientRegistry:
+    """Process-wide LRU of API clients, keyed by their constructor arguments.
+
+    Every request handler in a worker reuses the same client (and so the
+    same pooled session) for one configuration; different credentials get
+    separate entries. Clients past ``maxsize`` are dropped rather than
+    closed, since other threads may still be using them, and release their
+    sessions when garbage-collected. Cached clients are closed at exit.
+    """
+
+    def __init__(self, factory, maxsize: int = CLIENT_CACHE_SIZE):
+        self._factory = factory
+        self._maxsize = maxsize
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        atexit.register(self.close_all)
+
+    def get(self, *args):
+        """Return the shared client built by ``factory(*args)``."""
+        with self._lock:
+            client = self._clients.get(args)
+            if client is None:
+                client = self._clients[args] = self._factory(*args)
+                if len(self._clients) > self._maxsize:
+                    self._clients.popitem(last=False)
+            else:
+                self._clients.move_to_end(args)
+        return client
+
+    def close_all(self):
+        """Drain the pooled connections of every cached client."""
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
@@ -1,7 +1,8 @@
 """Multi-box packing algorithm using First Fit Decreasing (FFD)."""
 
+from bisect import bisect_left
 from dataclasses import dataclass, field
-from typing import List, Optional, Tuple
+from typing import Iterable, List, Optional, Sequence, Tuple
 import logging
 
 _logger = logging.getLogger(__name__)
@@ -11,7 +12,7 @@ GRAMS_PER_CUBIC_INCH = 9.0
 PRACTICAL_BOX_COUNT_SLACK = 1
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class PackableItem:
     """Represents a single unit to be packed."""
 
@@ -21,7 +22,7 @@ class PackableItem:
     quantity: int = 1  # Always 1 after expansion
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class BoxSpec:
     """Box specification from fulfillment.box."""
 
@@ -36,7 +37,7 @@ class BoxSpec:
     height: float
 
 
-@dataclass
+@dataclass(slots=True)
 class PackedBox:
     """Result of packing - a box with its assigned items."""
 
@@ -44,16 +45,17 @@ class PackedBox:
     items: List[PackableItem] = field(default_factory=list)
     total_item_weight: float = 0.0
     is_oversized: bool = False
+    # Total weight including box weight (for shipping API). Boxes are
+    # built once with their final contents, so it is computed up front.
+    total_weight_with_box: float = field(init=False, default=0.0)
 
-    @property
-    def total_weight_with_box(self) -> float:
-        """Total weight including box weight (for shipping API)."""
-        return self.total_item_weight + self.box_spec.box_weight_grams
+    def __post_init__(self):
+        self.total_weight_with_box = self.total_item_weight + self.box_spec.box_weight_grams
 
     @property
     def line_ids(self) -> List[int]:
-        """Get unique line IDs in this box."""
-        return list(set(item.line_id for item in self.items))
+        """Get unique line IDs in this box, in packing order."""
+        return list(dict.fromkeys(item.line_id for item in self.items))
 
     @property
     def line_quantities(self) -> dict:
@@ -64,7 +66,7 @@ class PackedBox:
         return counts
 
 
-@dataclass
+@dataclass(slots=True)
 class PackingResult:
     """Complete packing solution."""
 
@@ -82,6 +84,92 @@ class PackingResult:
         return any(pb.is_oversized for pb in self.packed_boxes)
 
 
+def box_specs_from_data(boxes_data: Iterable[dict]) -> Tuple[BoxSpec, ...]:
+    """Convert fulfillment.box read() dicts into box specs.
+
+    Weights are converted from ounces to grams here, once, and the result
+    is ordered by (max weight, priority) as the packer consumes it.
+    """
+    boxes = [
+        BoxSpec(
+            box_id=b["id"],
+            name=b.get("name", ""),
+            max_weight_grams=(b.get("max_weight") or 0) * GRAMS_PER_OUNCE,
+            box_weight_grams=(b.get("box_weight") or 0) * GRAMS_PER_OUNCE,
+            volume_cubic_inches=b.get("volume") or 0,
+            priority=b.get("priority") or 9999,
+            length=b.get("length") or 0,
+            width=b.get("width") or 0,
+            height=b.get("height") or 0,
+        )
+        for b in boxes_data
+    ]
+    boxes.sort(key=lambda b: (b.max_weight_grams, b.priority))
+    return tuple(boxes)
+
+
+class _OpenBinIndex:
+    """Segment tree over open bins of one box size for first-fit lookups.
+
+    Every node keeps the smallest current weight and volume of the bins
+    below it. A subtree whose minimums cannot take an item holds no bin
+    that can, so the leftmost fitting bin is found without scanning every
+    open bin. The box limits are plain floats so the lookup is arithmetic
+    and comparisons only, with the same outcome as ``_box_can_fit``.
+    """
+
+    __slots__ = ("_size", "_weights", "_volumes", "_max_weight", "_max_volume")
+
+    def __init__(self, capacity: int, box_spec: BoxSpec):
+        size = 1
+        while size < capacity:
+            size *= 2
+        self._size = size
+        self._max_weight = box_spec.max_weight_grams
+        # A box without a volume only has a weight limit.
+        self._max_volume = (
+            box_spec.volume_cubic_inches
+            if box_spec.volume_cubic_inches > 0
+            else float("inf")
+        )
+        self._weights = [float("inf")] * (2 * size)
+        self._volumes = [float("inf")] * (2 * size)
+
+    def update(self, index: int, weight_grams: float, volume_cubic_inches: float):
+        weights, volumes = self._weights, self._volumes
+        node = index + self._size
+        weights[node] = weight_grams
+        volumes[node] = volume_cubic_inches
+        node //= 2
+        while node:
+            left, right = 2 * node, 2 * node + 1
+            weight = min(weights[left], weights[right])
+            volume = min(volumes[left], volumes[right])
+            if weights[node] == weight and volumes[node] == volume:
+                break
+            weights[node] = weight
+            volumes[node] = volume
+            node //= 2
+
+    def find_first(self, weight_grams: float, volume_cubic_inches: float) -> Optional[int]:
+        """Index of the leftmost open bin that can take the given item."""
+        weights, volumes, size = self._weights, self._volumes, self._size
+        max_weight, max_volume = self._max_weight, self._max_volume
+        stack = [1]
+        while stack:
+            node = stack.pop()
+            if (
+                weights[node] + weight_grams > max_weight
+                or volumes[node] + volume_cubic_inches > max_volume
+            ):
+                continue
+            if node >= size:
+                return node - size
+            stack.append(2 * node + 1)
+            stack.append(2 * node)
+        return None
+
+
 class MultiBoxPacker:
     """FFD bin-packing algorithm for order fulfillment.
 
@@ -93,6 +181,16 @@ class MultiBoxPacker:
     def __init__(self, items: List[PackableItem], boxes: List[BoxSpec]):
         self.items = items
         self.boxes = boxes
+        # Box orderings depend only on the catalog, so build them once.
+        # Boxes with no positive max weight are ignored for automatic packing.
+        self._sorted_boxes = sorted(
+            (box for box in boxes if box.max_weight_grams > 0),
+            key=lambda b: (b.max_weight_grams, b.priority),
+        )
+        # Same boxes ordered smallest-first by _box_sort_key, so every
+        # "smallest box that fits" lookup is a first-fit scan.
+        self._boxes_by_fit = sorted(self._sorted_boxes, key=self._box_sort_key)
+        self._box_fit_volumes = self._fit_volumes(self._boxes_by_fit)
 
     @staticmethod
     def _estimate_volume(weight_grams: float) -> float:
@@ -131,45 +229,123 @@ class MultiBoxPacker:
         self,
         weight_grams: float,
         volume_cubic_inches: float,
-        boxes: List[BoxSpec],
+        boxes_by_fit: List[BoxSpec],
+        fit_volumes: Optional[List[float]] = None,
     ) -> Optional[BoxSpec]:
-        candidates = [
-            box_spec
-            for box_spec in boxes
-            if self._box_can_fit(box_spec, weight_grams, volume_cubic_inches)
+        """Return the first box that fits; ``boxes_by_fit`` is ordered by ``_box_sort_key``.
+
+        ``fit_volumes`` (from ``_fit_volumes``) lets boxes that are too small
+        by volume be skipped with a binary search instead of a scan.
+        """
+        start = 0
+        if fit_volumes and volume_cubic_inches:
+            start = bisect_left(fit_volumes, volume_cubic_inches)
+        for index in range(start, len(boxes_by_fit)):
+            box_spec = boxes_by_fit[index]
+            if self._box_can_fit(box_spec, weight_grams, volume_cubic_inches):
+                return box_spec
+        return None
+
+    @staticmethod
+    def _fit_volumes(boxes_by_fit: List[BoxSpec]) -> List[float]:
+        """Ascending volumes of the boxes that declare one.
+
+        ``_box_sort_key`` puts those boxes first, ordered by volume, so this
+        list indexes the front of ``boxes_by_fit``.
+        """
+        return [
+            box_spec.volume_cubic_inches
+            for box_spec in boxes_by_fit
+            if box_spec.volume_cubic_inches > 0
         ]
-        if not candidates:
-            return None
-        return sorted(candidates, key=self._box_sort_key)[0]
 
-    def _pack_items_for_target_box(
+    def _first_fit_bins(
         self,
         items: List[PackableItem],
+        item_volumes: List[float],
         target_box: BoxSpec,
-        boxes: List[BoxSpec],
-    ) -> Optional[List[PackedBox]]:
-        bins: List[Tuple[float, float, List[PackableItem]]] = []
-
-        for item in items:
-            item_volume = self._estimate_volume(item.weight_grams)
+    ) -> Optional[List[Tuple[float, float, List[PackableItem]]]]:
+        # Parallel per-bin columns, updated in place as items are placed.
+        bin_weights: List[float] = []
+        bin_volumes: List[float] = []
+        bin_items: List[List[PackableItem]] = []
+        # There can never be more bins than items.
+        open_bins = _OpenBinIndex(len(items), target_box)
+
+        for item, item_volume in zip(items, item_volumes):
             if not self._box_can_fit(target_box, item.weight_grams, item_volume):
                 return None
 
-            placed = False
-            for i, (current_weight, current_volume, bin_items) in enumerate(bins):
-                new_weight = current_weight + item.weight_grams
-                new_volume = current_volume + item_volume
-                if self._box_can_fit(target_box, new_weight, new_volume):
-                    bins[i] = (new_weight, new_volume, bin_items + [item])
-                    placed = True
-                    break
+            i = open_bins.find_first(item.weight_grams, item_volume)
+            if i is None:
+                bin_weights.append(item.weight_grams)
+                bin_volumes.append(item_volume)
+                bin_items.append([item])
+                open_bins.update(len(bin_items) - 1, item.weight_grams, item_volume)
+                continue
+
+            bin_weights[i] += item.weight_grams
+            bin_volumes[i] += item_volume
+            bin_items[i].append(item)
+            open_bins.update(i, bin_weights[i], bin_volumes[i])
 
-            if not placed:
-                bins.append((item.weight_grams, item_volume, [item]))
+        return list(zip(bin_weights, bin_volumes, bin_items))
+
+    def _identical_item_bins(
+        self,
+        items: List[PackableItem],
+        item_volumes: List[float],
+        target_box: BoxSpec,
+    ) -> Optional[List[Tuple[float, float, List[PackableItem]]]]:
+        """First-fit bins for items that all weigh the same.
+
+        First fit then fills bins one after another, so only one bin needs
+        simulating; the rest are slices. Totals are accumulated unit by
+        unit, exactly as ``_first_fit_bins`` would, so the floats match.
+        """
+        unit_weight, unit_volume = items[0].weight_grams, item_volumes[0]
+        if not self._box_can_fit(target_box, unit_weight, unit_volume):
+            return None
+
+        # fills[k] holds the totals of a bin with k + 1 units.
+        fills = [(unit_weight, unit_volume)]
+        while len(fills) < len(items):
+            weight, volume = fills[-1]
+            weight += unit_weight
+            volume += unit_volume
+            if not self._box_can_fit(target_box, weight, volume):
+                break
+            fills.append((weight, volume))
+
+        per_bin = len(fills)
+        bins = []
+        for start in range(0, len(items), per_bin):
+            bin_items = items[start:start + per_bin]
+            total_weight, total_volume = fills[len(bin_items) - 1]
+            bins.append((total_weight, total_volume, bin_items))
+        return bins
+
+    def _pack_items_for_target_box(
+        self,
+        items: List[PackableItem],
+        item_volumes: List[float],
+        target_box: BoxSpec,
+        boxes_by_fit: List[BoxSpec],
+        fit_volumes: List[float],
+    ) -> Optional[List[PackedBox]]:
+        # Items arrive heaviest first, so equal ends mean equal weights.
+        if items and items[0].weight_grams == items[-1].weight_grams:
+            bins = self._identical_item_bins(items, item_volumes, target_box)
+        else:
+            bins = self._first_fit_bins(items, item_volumes, target_box)
+        if bins is None:
+            return None
 
         packed_boxes = []
         for total_weight, total_volume, bin_items in bins:
-            box_spec = self._smallest_fitting_box(total_weight, total_volume, boxes)
+            box_spec = self._smallest_fitting_box(
+                total_weight, total_volume, boxes_by_fit, fit_volumes
+            )
             if not box_spec:
                 return None
             packed_boxes.append(
@@ -187,10 +363,16 @@ class MultiBoxPacker:
         self,
         items: List[PackableItem],
         boxes: List[BoxSpec],
+        boxes_by_fit: List[BoxSpec],
+        fit_volumes: List[float],
     ) -> Optional[List[PackedBox]]:
+        # Item volumes don't depend on the target box; estimate them once.
+        item_volumes = [self._estimate_volume(item.weight_grams) for item in items]
         solutions = []
         for target_box in boxes:
-            packed_boxes = self._pack_items_for_target_box(items, target_box, boxes)
+            packed_boxes = self._pack_items_for_target_box(
+                items, item_volumes, target_box, boxes_by_fit, fit_volumes
+            )
             if not packed_boxes:
                 continue
             solutions.append((target_box, packed_boxes))
@@ -226,11 +408,15 @@ class MultiBoxPacker:
                 target_box.priority,
             )
 
-        return sorted(practical_solutions, key=_solution_key)[0][1]
+        return min(practical_solutions, key=_solution_key)[1]
 
     @classmethod
-    def from_order(cls, order, boxes_data: List[dict]) -> "MultiBoxPacker":
-        """Factory method to create packer from Odoo order record."""
+    def from_order(cls, order, boxes: Sequence[BoxSpec]) -> "MultiBoxPacker":
+        """Factory method to create packer from Odoo order record.
+
+        ``boxes`` is the shared catalog from ``box_specs_from_data`` and is
+        not copied.
+        """
         items = []
         for line in order.line_ids:
             if not line.requires_shipping:
@@ -246,23 +432,7 @@ class MultiBoxPacker:
                 )
             )
 
-        boxes = []
-        for b in boxes_data:
-            boxes.append(
-                BoxSpec(
-                    box_id=b["id"],
-                    name=b.get("name", ""),
-                    max_weight_grams=(b.get("max_weight") or 0) * GRAMS_PER_OUNCE,
-                    box_weight_grams=(b.get("box_weight") or 0) * GRAMS_PER_OUNCE,
-                    volume_cubic_inches=b.get("volume") or 0,
-                    priority=b.get("priority") or 9999,
-                    length=b.get("length") or 0,
-                    width=b.get("width") or 0,
-                    height=b.get("height") or 0,
-                )
-            )
-
-        return cls(items, boxes)
+        return cls(items, list(boxes))
 
     def pack(self) -> PackingResult:
         """Execute FFD bin-packing algorithm.
@@ -275,52 +445,91 @@ class MultiBoxPacker:
         if not self.boxes:
             return PackingResult(success=False, error_message="No active boxes configured")
 
-        # Step 1: Expand items by quantity (each unit is separate)
-        expanded_items = []
-        for item in self.items:
-            for _ in range(item.quantity):
-                expanded_items.append(
-                    PackableItem(
-                        line_id=item.line_id,
-                        sku=item.sku,
-                        weight_grams=item.weight_grams,
-                        quantity=1,
-                    )
-                )
-
-        # Step 2: Sort items by weight DESCENDING (First Fit Decreasing)
-        expanded_items.sort(key=lambda x: x.weight_grams, reverse=True)
-
-        # Step 3: Sort usable boxes by max_weight ASCENDING, then priority.
-        # Boxes with no positive max weight are ignored for automatic packing.
-        usable_boxes = [box for box in self.boxes if box.max_weight_grams > 0]
-        if not usable_boxes:
+        # Step 1: Usable boxes by max_weight ASCENDING, then priority
+        # (sorted in __init__), and the largest box capacity.
+        sorted_boxes = self._sorted_boxes
+        if not sorted_boxes:
             return PackingResult(
                 success=False,
                 error_message="No boxes with positive max weight configured",
             )
+        boxes_by_fit = self._boxes_by_fit
+        fit_volumes = self._box_fit_volumes
+        largest_box = sorted_boxes[-1]  # Last after sorting is largest
+        max_box_capacity = largest_box.max_weight_grams
 
-        sorted_boxes = sorted(
-            usable_boxes, key=lambda b: (b.max_weight_grams, b.priority)
-        )
+        # Step 2: One unit per line. Units are never mutated, so every unit
+        # of a line is the same PackableItem instance.
+        line_units = [
+            (
+                PackableItem(
+                    line_id=item.line_id,
+                    sku=item.sku,
+                    weight_grams=item.weight_grams,
+                    quantity=1,
+                ),
+                item.quantity,
+            )
+            for item in self.items
+        ]
 
-        # Step 4: Find largest box capacity
-        max_box_capacity = max(b.max_weight_grams for b in usable_boxes)
-        largest_box = sorted_boxes[-1]  # Last after sorting is largest
+        # Step 3: If everything fits in a single box (by weight/volume), prefer
+        # 1 box. Checked on the lines, before any ordering work; such an order
+        # can't contain oversized items either.
+        total_weight = sum(unit.weight_grams * quantity for unit, quantity in line_units)
+        total_volume = self._estimate_volume(total_weight)
+        best_box = self._smallest_fitting_box(
+            total_weight,
+            total_volume,
+            boxes_by_fit,
+            fit_volumes,
+        )
+        if best_box:
+            _logger.info(
+                "Packing shortcut: all items fit in one box (%s) - %.0fg, %.0fin³",
+                best_box.name,
+                total_weight,
+                total_volume,
+            )
+            return PackingResult(
+                packed_boxes=[
+                    PackedBox(
+                        box_spec=best_box,
+                        items=[
+                            unit
+                            for unit, quantity in line_units
+                            for _ in range(quantity)
+                        ],
+                        total_item_weight=total_weight,
+                        is_oversized=False,
+                    )
+                ],
+                unpacked_items=[],
+                success=True,
+            )
 
-        # Step 5: Separate oversized items
+        # Step 4: Expand units by quantity, bucketed by weight. Units of a
+        # line share its weight, so there are only as many buckets as
+        # distinct line weights.
+        units_by_weight = {}
+        for unit, quantity in line_units:
+            units_by_weight.setdefault(unit.weight_grams, []).extend([unit] * quantity)
+
+        # Step 5: Order items by weight DESCENDING (First Fit Decreasing) and
+        # separate oversized ones in the same pass. Only the distinct weights
+        # are sorted; units keep their line order within a bucket, exactly as
+        # a stable sort would leave them. A bucket is oversized or not as a
+        # whole, since all its units weigh the same.
         oversized_items = []
         packable_items = []
-        for item in expanded_items:
-            if item.weight_grams > max_box_capacity:
-                oversized_items.append(item)
+        for weight in sorted(units_by_weight, reverse=True):
+            if weight > max_box_capacity:
+                oversized_items.extend(units_by_weight[weight])
             else:
-                packable_items.append(item)
+                packable_items.extend(units_by_weight[weight])
 
-        # Step 6: Initialize result
+        # Step 6: Handle oversized items (each gets largest box, flagged)
         packed_boxes: List[PackedBox] = []
-
-        # Step 7: Handle oversized items (each gets largest box, flagged)
         for item in oversized_items:
             _logger.warning(
                 "Oversized item: SKU=%s weight=%.0fg exceeds max box capacity %.0fg",
@@ -337,41 +546,12 @@ class MultiBoxPacker:
                 )
             )
 
-        # Step 7b: If everything fits in a single box (by weight/volume), prefer 1 box.
-        if not oversized_items:
-            total_weight = sum(item.weight_grams for item in packable_items)
-            total_volume = self._estimate_volume(total_weight)
-            candidate_boxes = [
-                b
-                for b in sorted_boxes
-                if self._box_can_fit(b, total_weight, total_volume)
-            ]
-            if candidate_boxes:
-                best_box = sorted(candidate_boxes, key=self._box_sort_key)[0]
-                _logger.info(
-                    "Packing shortcut: all items fit in one box (%s) - %.0fg, %.0fin³",
-                    best_box.name,
-                    total_weight,
-                    total_volume,
-                )
-                packed_boxes.append(
-                    PackedBox(
-                        box_spec=best_box,
-                        items=packable_items,
-                        total_item_weight=total_weight,
-                        is_oversized=False,
-                    )
-                )
-                return PackingResult(
-                    packed_boxes=packed_boxes,
-                    unpacked_items=[],
-                    success=True,
-                )
-
-        # Step 8: Choose a practical whole-order carton tier, then pack with FFD.
+        # Step 7: Choose a practical whole-order carton tier, then pack with FFD.
         # This avoids opening one tiny carton per light item when larger cartons are
         # available and only costs at most one label versus the absolute minimum.
-        practical_boxes = self._choose_practical_packing_plan(packable_items, sorted_boxes)
+        practical_boxes = self._choose_practical_packing_plan(
+            packable_items, sorted_boxes, boxes_by_fit, fit_volumes
+        )
         if practical_boxes is None:
             first_item = packable_items[0] if packable_items else None
             if first_item:
@@ -398,23 +578,24 @@ class MultiBoxPacker:
                 len(practical_boxes),
             )
 
-        # Step 10: Log packing summary
+        # Step 8: Log packing summary
         _logger.info(
             "Packing complete: %d items -> %d boxes (oversized: %d)",
-            len(expanded_items),
+            len(oversized_items) + len(packable_items),
             len(packed_boxes),
             len(oversized_items),
         )
-        for i, pb in enumerate(packed_boxes, 1):
-            _logger.debug(
-                "  Box %d: %s (%.0fg/%.0fg) items=%d oversized=%s",
-                i,
-                pb.box_spec.name,
-                pb.total_item_weight,
-                pb.box_spec.max_weight_grams,
-                len(pb.items),
-                pb.is_oversized,
-            )
+        if _logger.isEnabledFor(logging.DEBUG):
+            for i, pb in enumerate(packed_boxes, 1):
+                _logger.debug(
+                    "  Box %d: %s (%.0fg/%.0fg) items=%d oversized=%s",
+                    i,
+                    pb.box_spec.name,
+                    pb.total_item_weight,
+                    pb.box_spec.max_weight_grams,
+                    len(pb.items),
+                    pb.is_oversized,
+                )
 
         # Return result
         return PackingResult(
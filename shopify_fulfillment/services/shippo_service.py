@@ -1,13 +1,29 @@
 import logging
 import re
+import threading
 import time
+from collections import OrderedDict
 import requests
-import json
 from odoo import exceptions
 from .address_utils import normalize_address_lines
+from .http_session import ClientRegistry, build_session, json_dumps, json_loads
 
 _logger = logging.getLogger(__name__)
 
+# Downloaded label files by URL, least recently used first. Shared by every
+# client so a reprint hits the cache whichever client served the purchase.
+LABEL_CACHE_SIZE = 64
+_label_cache: "OrderedDict[str, str]" = OrderedDict()
+_label_cache_lock = threading.Lock()
+
+# Extension suffixes, including punctuation used by marketplaces:
+# "ext. 123", "ext: 123", "ext. #123", "x123", "extension 123", etc.
+_PHONE_EXTENSION_RE = re.compile(
+    r'\s*(?:ext(?:ension)?\.?|x)\s*[:.#-]?\s*\d+.*$', re.IGNORECASE
+)
+# Anything but digits, spaces, dashes, parentheses, and plus sign.
+_PHONE_DISALLOWED_RE = re.compile(r'[^\d\s\-\(\)\+]')
+
 
 def sanitize_phone(phone: str) -> str:
     """Clean phone number for shipping APIs.
@@ -18,17 +34,8 @@ def sanitize_phone(phone: str) -> str:
     if not phone:
         return ""
     
-    # Remove extension patterns, including punctuation used by marketplaces:
-    # "ext. 123", "ext: 123", "ext. #123", "x123", "extension 123", etc.
-    phone = re.sub(
-        r'\s*(?:ext(?:ension)?\.?|x)\s*[:.#-]?\s*\d+.*$',
-        '',
-        phone,
-        flags=re.IGNORECASE,
-    )
-    
-    # Keep only digits, spaces, dashes, parentheses, and plus sign
-    phone = re.sub(r'[^\d\s\-\(\)\+]', '', phone)
+    phone = _PHONE_EXTENSION_RE.sub('', phone)
+    phone = _PHONE_DISALLOWED_RE.sub('', phone)
     
     # Clean up extra whitespace
     phone = ' '.join(phone.split())
@@ -37,12 +44,20 @@ def sanitize_phone(phone: str) -> str:
 
 class ShippoService:
     API_URL = "https://api.goshippo.com"
+    SHIPMENTS_URL = API_URL + "/shipments"
+    TRANSACTIONS_URL = API_URL + "/transactions"
+    REFUNDS_URL = API_URL + "/refunds/"
     RATE_REQUEST_ATTEMPTS = 3
     TRANSIENT_RATE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
 
     def __init__(self, api_key: str, shipper_phone: str = None):
         self.api_key = api_key
         self.shipper_phone = shipper_phone or "555-555-5555"
+        # Reused across calls so multi-box orders keep keep-alive
+        # connections to Shippo instead of a TLS handshake per request. The
+        # pool is sized for concurrent rate shopping across a batch.
+        self._session = build_session(pool_maxsize=16)
+        self._session.headers.update(self._headers())
 
     @classmethod
     def from_env(cls, env):
@@ -52,7 +67,11 @@ class ShippoService:
         # Return None if not configured, allowing caller to handle fallback
         if not api_key:
             return None
-        return cls(api_key, shipper_phone)
+        return _clients.get(api_key, shipper_phone)
+
+    def close(self):
+        """Release the pooled connections held by this client."""
+        self._session.close()
 
     def _headers(self):
         return {
@@ -68,10 +87,9 @@ class ShippoService:
         """
         for attempt in range(1, self.RATE_REQUEST_ATTEMPTS + 1):
             try:
-                response = requests.post(
+                response = self._session.post(
                     url,
-                    headers=self._headers(),
-                    json=payload,
+                    data=json_dumps(payload),
                     timeout=15,
                 )
             except requests.RequestException:
@@ -108,43 +126,9 @@ class ShippoService:
         raise RuntimeError("Shippo rate request exhausted without a response")
 
     def get_rates(self, order, box, sender_company):
-        url = f"{self.API_URL}/shipments"
-
         # 1. Prepare Addresses
-        # Ensure we have defaults for missing fields to avoid 400 errors
-        to_street1, to_street2 = normalize_address_lines(
-            order.shipping_address_line1,
-            order.shipping_address_line2,
-        )
-        from_street1, from_street2 = normalize_address_lines(
-            sender_company.street,
-            sender_company.street2,
-        )
-
-        address_to = {
-            "name": order.customer_name or "Customer",
-            "street1": to_street1,
-            "street2": to_street2,
-            "city": order.shipping_city or "",
-            "state": order.shipping_state or "",
-            "zip": order.shipping_zip or "",
-            "country": order.shipping_country or "US",
-            "phone": sanitize_phone(order.shipping_phone),
-            "email": order.email or "no-reply@example.com",
-            "validate": True,
-        }
-
-        address_from = {
-            "name": sender_company.name,
-            "street1": from_street1,
-            "street2": from_street2,
-            "city": sender_company.city or "",
-            "state": sender_company.state_id.code if sender_company.state_id else "",
-            "zip": sender_company.zip or "",
-            "country": sender_company.country_id.code if sender_company.country_id else "US",
-            "phone": sender_company.phone or self.shipper_phone,
-            "email": sender_company.email or "no-reply@example.com",
-        }
+        address_to = self.build_address_to(order)
+        address_from = self.build_address_from(sender_company)
 
         # 2. Prepare Parcel
         # Odoo stores weight in grams (from our shopify_order model)
@@ -172,71 +156,34 @@ class ShippoService:
             "async": False,
         }
 
-        _logger.info("Shippo: Creating shipment for Order %s", order.id)
-        _logger.info("Shippo: From: %s, %s %s", address_from.get("city"), address_from.get("state"), address_from.get("zip"))
-        _logger.info("Shippo: To: %s, %s %s", address_to.get("city"), address_to.get("state"), address_to.get("zip"))
-        _logger.info("Shippo: Parcel: %sx%sx%s in, %s g", parcel["length"], parcel["width"], parcel["height"], parcel["weight"])
+        if _logger.isEnabledFor(logging.INFO):
+            _logger.info("Shippo: Creating shipment for Order %s", order.id)
+            _logger.info("Shippo: From: %s, %s %s", address_from.get("city"), address_from.get("state"), address_from.get("zip"))
+            _logger.info("Shippo: To: %s, %s %s", address_to.get("city"), address_to.get("state"), address_to.get("zip"))
+            _logger.info("Shippo: Parcel: %sx%sx%s in, %s g", parcel["length"], parcel["width"], parcel["height"], parcel["weight"])
         
-        try:
-            resp = self._post_rate_request(url, payload)
-            _logger.info("Shippo: Response status: %s", resp.status_code)
-            
-            if resp.status_code >= 400:
-                _logger.error("Shippo Error: %s", resp.text)
-                return []
-            
-            data = resp.json()
-            rates = data.get("rates", [])
-            messages = data.get("messages", [])
-            
-            _logger.info("Shippo: Got %d rates", len(rates))
-            if messages:
-                _logger.warning("Shippo messages: %s", messages)
-            if rates:
-                for r in rates[:3]:  # Log first 3 rates
-                    _logger.info("  Rate: %s %s - $%s", 
-                                r.get("provider"), r.get("servicelevel", {}).get("name"), r.get("amount"))
-            
-            return rates
-        except Exception as e:
-            _logger.exception("Failed to connect to Shippo: %s", e)
+        data = self._post_shipment(payload)
+        if data is None:
             return []
 
-    def get_rates_for_box(self, order, box, total_weight_grams: float, sender_company):
-        """Get shipping rates for a specific box with explicit weight.
+        rates = data.get("rates", [])
+        _logger.info("Shippo: Got %d rates", len(rates))
+        self._log_rates(data, rates)
+        return rates
 
-        This method is used for multi-box shipments where each box has its own
-        weight calculated by the packing algorithm.
+    def build_address_to(self, order):
+        """Shippo recipient address for an order.
 
-        Args:
-            order: shopify.order record (for addresses)
-            box: fulfillment.box record (for dimensions)
-            total_weight_grams: Pre-calculated total weight including box (in grams)
-            sender_company: res.company record (sender address)
-
-        Returns:
-            Tuple of (rates, meta):
-                rates: list of rate objects from Shippo
-                meta: dict with keys:
-                    - is_residential: bool | None (from Shippo address validation)
-                    - validation_results: dict | None (raw Shippo validation output)
+        Missing fields get defaults to avoid 400 errors.
         """
-        url = f"{self.API_URL}/shipments"
-
-        # Prepare addresses (same as get_rates)
-        to_street1, to_street2 = normalize_address_lines(
+        street1, street2 = normalize_address_lines(
             order.shipping_address_line1,
             order.shipping_address_line2,
         )
-        from_street1, from_street2 = normalize_address_lines(
-            sender_company.street,
-            sender_company.street2,
-        )
-
-        address_to = {
+        return {
             "name": order.customer_name or "Customer",
-            "street1": to_street1,
-            "street2": to_street2,
+            "street1": street1,
+            "street2": street2,
             "city": order.shipping_city or "",
             "state": order.shipping_state or "",
             "zip": order.shipping_zip or "",
@@ -246,10 +193,16 @@ class ShippoService:
             "validate": True,
         }
 
-        address_from = {
+    def build_address_from(self, sender_company):
+        """Shippo sender address for a company."""
+        street1, street2 = normalize_address_lines(
+            sender_company.street,
+            sender_company.street2,
+        )
+        return {
             "name": sender_company.name,
-            "street1": from_street1,
-            "street2": from_street2,
+            "street1": street1,
+            "street2": street2,
             "city": sender_company.city or "",
             "state": sender_company.state_id.code if sender_company.state_id else "",
             "zip": sender_company.zip or "",
@@ -258,6 +211,28 @@ class ShippoService:
             "email": sender_company.email or "no-reply@example.com",
         }
 
+    def build_box_shipment_payload(
+        self,
+        order,
+        box,
+        total_weight_grams: float,
+        sender_company,
+        address_to=None,
+        address_from=None,
+    ):
+        """Build the shipment payload for one box.
+
+        Reads the order, box and company records, so call it from the thread
+        that owns the Odoo cursor; the result is plain data that
+        get_rates_for_payload can send from any thread. Pass ``address_to``
+        and ``address_from`` (from build_address_to/build_address_from) to
+        share them across the boxes of one order instead of rebuilding them.
+        """
+        if address_to is None:
+            address_to = self.build_address_to(order)
+        if address_from is None:
+            address_from = self.build_address_from(sender_company)
+
         # Prepare parcel with explicit weight (already includes box weight)
         parcel = {
             "length": box.length,
@@ -268,60 +243,86 @@ class ShippoService:
             "mass_unit": "g",
         }
 
-        payload = {
+        return {
             "address_from": address_from,
             "address_to": address_to,
             "parcels": [parcel],
             "async": False,
         }
 
+    def get_rates_for_payload(self, payload, order_id=None, box_name=None):
+        """Create a Shippo shipment from a prepared payload and return its rates.
+
+        Does not touch Odoo records, so it is safe to run from worker threads.
+
+        Returns:
+            Tuple of (rates, meta):
+                rates: list of rate objects from Shippo
+                meta: dict with keys:
+                    - is_residential: bool | None (from Shippo address validation)
+                    - validation_results: dict | None (raw Shippo validation output)
+        """
+        if _logger.isEnabledFor(logging.INFO):
+            parcel = payload["parcels"][0]
+            _logger.info(
+                "Shippo (multi-box): Creating shipment for Order %s, Box %s",
+                order_id,
+                box_name,
+            )
+            _logger.info(
+                "Shippo: Parcel: %sx%sx%s in, %.0f g",
+                parcel["length"],
+                parcel["width"],
+                parcel["height"],
+                parcel["weight"],
+            )
+
+        data = self._post_shipment(payload)
+        if data is None:
+            return [], {"is_residential": None, "validation_results": None}
+
+        rates = data.get("rates", [])
+        meta = self._extract_address_meta(data.get("address_to"))
         _logger.info(
-            "Shippo (multi-box): Creating shipment for Order %s, Box %s",
-            order.id,
-            box.name,
-        )
-        _logger.info(
-            "Shippo: Parcel: %sx%sx%s in, %.0f g",
-            parcel["length"],
-            parcel["width"],
-            parcel["height"],
-            parcel["weight"],
+            "Shippo: Got %d rates for box %s (is_residential=%s)",
+            len(rates),
+            box_name,
+            meta.get("is_residential"),
         )
+        self._log_rates(data, rates)
+        return rates, meta
 
+    def _post_shipment(self, payload):
+        """Create a Shippo shipment and return the decoded response.
+
+        Returns None when the request fails or Shippo rejects it; the error
+        is logged here so callers only deal with the happy path.
+        """
         try:
-            resp = self._post_rate_request(url, payload)
+            resp = self._post_rate_request(self.SHIPMENTS_URL, payload)
             _logger.info("Shippo: Response status: %s", resp.status_code)
-
             if resp.status_code >= 400:
                 _logger.error("Shippo Error: %s", resp.text)
-                return [], {"is_residential": None, "validation_results": None}
-
-            data = resp.json()
-            rates = data.get("rates", [])
-            messages = data.get("messages", [])
-            meta = self._extract_address_meta(data.get("address_to"))
+                return None
+            return json_loads(resp.content)
+        except Exception as e:
+            _logger.exception("Failed to connect to Shippo: %s", e)
+            return None
 
+    @staticmethod
+    def _log_rates(data, rates):
+        messages = data.get("messages", [])
+        if messages:
+            _logger.warning("Shippo messages: %s", messages)
+        if not _logger.isEnabledFor(logging.INFO):
+            return
+        for r in rates[:3]:  # Log first 3 rates
             _logger.info(
-                "Shippo: Got %d rates for box %s (is_residential=%s)",
-                len(rates),
-                box.name,
-                meta.get("is_residential"),
+                "  Rate: %s %s - $%s",
+                r.get("provider"),
+                (r.get("servicelevel") or {}).get("name"),
+                r.get("amount"),
             )
-            if messages:
-                _logger.warning("Shippo messages: %s", messages)
-            if rates:
-                for r in rates[:3]:
-                    _logger.info(
-                        "  Rate: %s %s - $%s",
-                        r.get("provider"),
-                        r.get("servicelevel", {}).get("name"),
-                        r.get("amount"),
-                    )
-
-            return rates, meta
-        except Exception as e:
-            _logger.exception("Failed to connect to Shippo: %s", e)
-            return [], {"is_residential": None, "validation_results": None}
 
     @staticmethod
     def _extract_address_meta(address_obj):
@@ -340,7 +341,7 @@ class ShippoService:
 
     def _get_transactions_page(self, results: int = 100, page: int = 1):
         """Fetch one page of Shippo label transactions."""
-        url = f"{self.API_URL}/transactions"
+        url = self.TRANSACTIONS_URL
         params = {"results": results, "page": page}
 
         _logger.info(
@@ -350,14 +351,14 @@ class ShippoService:
         )
 
         try:
-            resp = requests.get(url, headers=self._headers(), params=params, timeout=15)
+            resp = self._session.get(url, params=params, timeout=15)
             _logger.info("Shippo transactions status: %s", resp.status_code)
 
             if resp.status_code >= 400:
                 _logger.error("Shippo transactions error: %s", resp.text)
                 return {"results": [], "next": None, "previous": None}
 
-            data = resp.json()
+            data = json_loads(resp.content)
             results = data.get("results", [])
             if not isinstance(results, list):
                 _logger.warning("Shippo transactions payload missing list in 'results'")
@@ -408,19 +409,19 @@ class ShippoService:
         if not transaction_id:
             return {"error": "Missing Shippo transaction ID"}
 
-        url = f"{self.API_URL}/refunds/"
+        url = self.REFUNDS_URL
         payload = {"transaction": transaction_id, "async": False}
 
         _logger.info("Shippo: Requesting refund for transaction %s", transaction_id)
         try:
-            resp = requests.post(url, headers=self._headers(), json=payload, timeout=20)
+            resp = self._session.post(url, data=json_dumps(payload), timeout=20)
             _logger.info("Shippo Refund Response Status: %s", resp.status_code)
 
             if resp.status_code >= 400:
                 _logger.error("Shippo Refund Error: %s", resp.text)
                 return {"error": resp.text or f"HTTP {resp.status_code}"}
 
-            data = resp.json()
+            data = json_loads(resp.content)
             if data.get("status") == "ERROR":
                 _logger.error("Shippo Refund rejected: %s", data)
                 return {"error": "Refund rejected by Shippo", **data}
@@ -433,7 +434,7 @@ class ShippoService:
         """
         Purchase the label for the given rate object (from get_rates).
         """
-        url = f"{self.API_URL}/transactions"
+        url = self.TRANSACTIONS_URL
         rate_id = rate_obj.get("object_id")
         
         payload = {
@@ -445,14 +446,14 @@ class ShippoService:
         _logger.info("Shippo: Buying label for rate %s", rate_id)
 
         try:
-            resp = requests.post(url, headers=self._headers(), json=payload, timeout=20)
+            resp = self._session.post(url, data=json_dumps(payload), timeout=20)
             _logger.info("Shippo Transaction Response Status: %s", resp.status_code)
             
             if resp.status_code >= 400:
                 _logger.error("Shippo Transaction Error: %s", resp.text)
                 return None
             
-            data = resp.json()
+            data = json_loads(resp.content)
             status = data.get("status")
             label_file_type = data.get("label_file_type")
             label_url = data.get("label_url")
@@ -486,10 +487,11 @@ class ShippoService:
             # Download ZPL content immediately if we have a URL
             if label_url:
                 _logger.info("Downloading label from: %s", label_url)
-                zpl_data = self._download_url(label_url)
+                zpl_data = self.fetch_label_zpl(label_url)
                 if zpl_data:
-                    _logger.info("Downloaded ZPL label: %d bytes, starts with: %s...", 
-                                len(zpl_data), zpl_data[:100] if len(zpl_data) > 100 else zpl_data)
+                    if _logger.isEnabledFor(logging.INFO):
+                        _logger.info("Downloaded ZPL label: %d bytes, starts with: %s...",
+                                     len(zpl_data), zpl_data[:100])
                 else:
                     _logger.warning("Failed to download ZPL from %s", label_url)
             else:
@@ -511,30 +513,65 @@ class ShippoService:
             _logger.exception("Shippo Purchase Failed: %s", e)
             return None
 
+    def fetch_label_zpl(self, label_url):
+        """Return label content for ``label_url``, or None if it can't be fetched.
+
+        Label files never change once purchased, so successful downloads are
+        cached and reprints of a recent label don't download it again.
+        """
+        with _label_cache_lock:
+            data = _label_cache.get(label_url)
+            if data is not None:
+                _label_cache.move_to_end(label_url)
+                return data
+
+        data = self._download_url(label_url)
+        if not data:
+            return None
+        with _label_cache_lock:
+            _label_cache[label_url] = data
+            _label_cache.move_to_end(label_url)
+            if len(_label_cache) > LABEL_CACHE_SIZE:
+                _label_cache.popitem(last=False)
+        return data
+
     def _download_url(self, url):
         try:
             _logger.info("Attempting to download from URL: %s", url)
-            r = requests.get(url, timeout=10)
-            payload_bytes = r.content or b""
+            # Label files live on a storage host, not the Shippo API: don't
+            # send it the API token (signed storage URLs reject it anyway).
+            # Streamed so an error body is never read past its preview.
+            with self._session.get(
+                url, headers={"Authorization": None}, timeout=10, stream=True
+            ) as r:
+                if r.status_code != 200:
+                    response_preview = next(r.iter_content(200), b"")
+                    _logger.error(
+                        "Download failed with status %s: %s",
+                        r.status_code,
+                        response_preview.decode("latin1", errors="ignore"),
+                    )
+                    return None
+                payload_bytes = r.content or b""
+                encoding = r.encoding
             _logger.info(
                 "Download response: status=%s, content-type=%s, length=%d",
                 r.status_code,
                 r.headers.get("content-type"),
                 len(payload_bytes),
             )
-            if r.status_code == 200:
-                if payload_bytes.startswith(b"%PDF-"):
-                    # Preserve bytes losslessly for PDF transport by using 1:1 Latin-1 mapping.
-                    return payload_bytes.decode("latin1")
-
-                preferred_encoding = r.encoding or "utf-8"
-                try:
-                    return payload_bytes.decode(preferred_encoding)
-                except Exception:
-                    return payload_bytes.decode("latin1", errors="ignore")
-            else:
-                response_preview = payload_bytes[:200].decode("latin1", errors="ignore")
-                _logger.error("Download failed with status %s: %s", r.status_code, response_preview)
+            if payload_bytes.startswith(b"%PDF-"):
+                # Preserve bytes losslessly for PDF transport by using 1:1 Latin-1 mapping.
+                return payload_bytes.decode("latin1")
+
+            try:
+                return payload_bytes.decode(encoding or "utf-8")
+            except Exception:
+                return payload_bytes.decode("latin1", errors="ignore")
         except Exception as e:
             _logger.exception("Failed to download label content from %s: %s", url, e)
         return None
+
+
+# One client per credential set for the life of the worker.
+_clients = ClientRegistry(ShippoService)
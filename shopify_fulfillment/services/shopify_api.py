@@ -3,24 +3,154 @@
 import base64
 import hmac
 import logging
-from hashlib import sha256
-from typing import Any, Dict, List, Optional
+import secrets
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from urllib.parse import urlencode
 
-import requests
 from odoo import exceptions
 
+from .http_session import (
+    CONNECT_TIMEOUT,
+    ClientRegistry,
+    build_session,
+    json_dumps,
+    json_loads,
+)
+
 _logger = logging.getLogger(__name__)
 
+VARIANT_WEIGHTS_SEARCH_QUERY = """
+query VariantWeightsSearch($query: String!, $after: String) {
+  productVariants(first: 250, query: $query, after: $after) {
+    edges {
+      node {
+        id
+        sku
+        weight
+        weightUnit
+      }
+    }
+    pageInfo {
+      hasNextPage
+      endCursor
+    }
+  }
+}
+"""
+
+ORDER_RISK_QUERY = """
+query OrderRisk($id: ID!) {
+  order(id: $id) {
+    risk {
+      recommendation
+      assessments {
+        riskLevel
+      }
+    }
+  }
+}
+"""
+
+ORDER_RISKS_BY_ID_QUERY = """
+query OrderRisksById($ids: [ID!]!) {
+  nodes(ids: $ids) {
+    ... on Order {
+      id
+      risk {
+        recommendation
+        assessments {
+          riskLevel
+        }
+      }
+    }
+  }
+}
+"""
+
+# Placeholder label returned by purchase_label until real carrier labels land.
+_MOCK_LABEL_ZPL = (
+    "^XA\n"
+    "^PW812\n"
+    "^LL1218\n"
+    "^FO50,50^ADN,36,20^FD%s^FS\n"
+    "^FO50,100^ADN,36,20^FDShip To: %s^FS\n"
+    "^FO50,150^ADN,36,20^FD%s, %s^FS\n"
+    "^FO50,250^BY3\n"
+    "^BCN,100,Y,N,N\n"
+    "^FD%s^FS\n"
+    "^XZ"
+)
+
+# Shopify's maximum page size for orders.json.
+ORDERS_PER_REQUEST = 250
+
+# REST variant payloads are reused for this long (seconds): long enough to
+# cover one processing or inventory-sync run, short enough that a variant
+# edited in Shopify is picked up on the next run. Clients live as long as
+# the worker process, and there is no product webhook to invalidate them.
+VARIANT_CACHE_TTL = 300
+VARIANT_CACHE_SIZE = 4096
+
+# Grams per Shopify weightUnit.
+WEIGHT_UNIT_GRAMS = {
+    "KILOGRAMS": 1000.0,
+    "GRAMS": 1.0,
+    "POUNDS": 453.592,
+    "OUNCES": 28.3495,
+}
+
+# REST leaky bucket: once a response reports the bucket this full, pause
+# before the next call instead of running into 429s.
+CALL_LIMIT_HEADER = "X-Shopify-Shop-Api-Call-Limit"
+CALL_LIMIT_THRESHOLD = 0.8
+CALL_LIMIT_PAUSE = 0.5
+
+
+def _throttle_on_call_limit(resp, *args, **kwargs):
+    """Session response hook: back off while the REST call bucket is nearly full."""
+    used, _, size = resp.headers.get(CALL_LIMIT_HEADER, "").partition("/")
+    try:
+        if int(used) >= CALL_LIMIT_THRESHOLD * int(size):
+            time.sleep(CALL_LIMIT_PAUSE)
+    except ValueError:  # header missing (GraphQL) or malformed
+        pass
+
 
 class ShopifyAPI:
     """Thin wrapper around Shopify Admin API."""
 
+    __slots__ = (
+        "shop_domain",
+        "api_key",
+        "api_version",
+        "webhook_secret",
+        "_base_url",
+        "_variant_cache",
+        "_variant_cache_lock",
+        "_session",
+    )
+
     def __init__(self, shop_domain: str, api_key: str, api_version: str, webhook_secret: Optional[str] = None):
         self.shop_domain = shop_domain
         self.api_key = api_key
         self.api_version = api_version
         self.webhook_secret = webhook_secret
+        self._base_url = f"https://{shop_domain}/admin/api/{api_version}"
+        # variant id -> (expires at, variant payload); shared by worker threads.
+        self._variant_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._variant_cache_lock = threading.Lock()
+        # Persistent session: keep-alive and connection pooling per shop,
+        # with the auth headers every request needs.
+        self._session = build_session(pool_maxsize=16)
+        self._session.headers.update(
+            {
+                "Content-Type": "application/json",
+                "X-Shopify-Access-Token": api_key,
+            }
+        )
+        self._session.hooks["response"].append(_throttle_on_call_limit)
 
     @classmethod
     def from_env(cls, env):
@@ -31,16 +161,14 @@ class ShopifyAPI:
         webhook_secret = ICP.get_param("shopify.webhook_secret")
         if not shop_domain or not api_key:
             raise exceptions.UserError("Shopify domain/api key not configured")
-        return cls(shop_domain, api_key, api_version, webhook_secret)
+        return _clients.get(shop_domain, api_key, api_version, webhook_secret)
 
-    def _headers(self):
-        return {
-            "Content-Type": "application/json",
-            "X-Shopify-Access-Token": self.api_key,
-        }
+    def close(self):
+        """Release the pooled connections held by this client."""
+        self._session.close()
 
     def _url(self, path: str) -> str:
-        return f"https://{self.shop_domain}/admin/api/{self.api_version}{path}"
+        return self._base_url + path
 
     def get_shipping_rates(self, order) -> List[Dict[str, Any]]:
         """
@@ -60,30 +188,22 @@ class ShopifyAPI:
         """
         _logger.info("Purchasing label for order %s (rate %s)", order.id, rate_id)
         
-        # Mock tracking number
-        import random
-        tracking_num = f"1Z{random.randint(100000, 999999)}"
-        
-        # Generate a simple ZPL label for testing
-        zpl = f"""
-^XA
-^PW812
-^LL1218
-^FO50,50^ADN,36,20^FD{order.order_name}^FS
-^FO50,100^ADN,36,20^FDShip To: {order.customer_name}^FS
-^FO50,150^ADN,36,20^FD{order.shipping_city}, {order.shipping_state}^FS
-^FO50,250^BY3
-^BCN,100,Y,N,N
-^FD{tracking_num}^FS
-^XZ
-"""
+        # Mock tracking number and a simple ZPL label for testing
+        tracking_num = f"1Z{secrets.randbelow(900000) + 100000}"
+        zpl = _MOCK_LABEL_ZPL % (
+            order.order_name,
+            order.customer_name,
+            order.shipping_city,
+            order.shipping_state,
+            tracking_num,
+        )
         return {
             "carrier": "UPS",
             "service": "Ground",
             "tracking_number": tracking_num,
             "tracking_url": f"https://www.ups.com/track?loc=en_US&tracknum={tracking_num}",
             "label_url": "",
-            "label_zpl": zpl.strip(),
+            "label_zpl": zpl,
             "rate_amount": 12.50,
             "rate_currency": "USD",
             "shopify_fulfillment_id": "",
@@ -163,10 +283,10 @@ class ShopifyAPI:
         }
 
         url = self._url("/fulfillments.json")
-        resp = requests.post(url, headers=self._headers(), json=payload, timeout=30)
+        resp = self._session.post(url, data=json_dumps(payload), timeout=(CONNECT_TIMEOUT, 30))
         if resp.status_code >= 400:
             raise exceptions.UserError(f"Fulfillment failed: {resp.text}")
-        return resp.json()
+        return json_loads(resp.content)
 
     def _get_fulfillable_orders(self, shopify_order_id: str) -> List[Dict[str, Any]]:
         """Fetch fulfillment orders that still have items to fulfill.
@@ -176,12 +296,12 @@ class ShopifyAPI:
         in_progress even though other items remain fulfillable.
         """
         url = self._url(f"/orders/{shopify_order_id}/fulfillment_orders.json")
-        resp = requests.get(url, headers=self._headers(), timeout=15)
+        resp = self._session.get(url, timeout=(CONNECT_TIMEOUT, 15))
         if resp.status_code != 200:
             _logger.error("Failed to fetch fulfillment orders: %s", resp.text)
             return []
 
-        data = resp.json()
+        data = json_loads(resp.content)
         return [
             fo
             for fo in data.get("fulfillment_orders", [])
@@ -191,81 +311,105 @@ class ShopifyAPI:
     def get_orders(self, shopify_ids: List[str]) -> List[Dict[str, Any]]:
         """
         Fetch multiple orders by Shopify ID.
+
+        IDs are requested in chunks of ORDERS_PER_REQUEST, the most one
+        orders.json page returns. Callers that need concurrency (status
+        sync) already fan out their own batches, so chunks run in sequence.
         """
-        if not shopify_ids:
-            return []
-            
-        # Shopify allows fetching by IDs using comma-separated list
-        # We need to chunk it if it's too large, but for now we assume < 50 items
-        ids_str = ",".join(shopify_ids)
-        url = self._url(f"/orders.json?ids={ids_str}&status=any")
-        
-        resp = requests.get(url, headers=self._headers(), timeout=30)
-        if resp.status_code != 200:
-            _logger.error("Failed to fetch orders: %s", resp.text)
-            return []
-            
-        return resp.json().get("orders", [])
+        orders = []
+        for i in range(0, len(shopify_ids), ORDERS_PER_REQUEST):
+            chunk = shopify_ids[i : i + ORDERS_PER_REQUEST]
+            params = urlencode({"ids": ",".join(chunk), "status": "any", "limit": len(chunk)})
+            url = self._url(f"/orders.json?{params}")
+            resp = self._session.get(url, timeout=(CONNECT_TIMEOUT, 30))
+            if resp.status_code != 200:
+                _logger.error("Failed to fetch orders: %s", resp.text)
+                continue
+            orders.extend(json_loads(resp.content).get("orders", []))
+        return orders
 
     def get_unfulfilled_orders(self, limit: int = 50) -> List[Dict[str, Any]]:
         """
         Fetch all unfulfilled orders from Shopify.
-        Handles pagination to get all orders.
+        See iter_unfulfilled_orders() to process them page by page.
+        """
+        return list(self.iter_unfulfilled_orders(limit=limit))
+
+    def iter_unfulfilled_orders(self, limit: int = 50) -> Iterator[Dict[str, Any]]:
+        """
+        Yield open, unfulfilled orders one page at a time.
+
+        Follows Shopify's Link header cursor, so only the current page is
+        held in memory. Stops (after logging) on the first failed page.
         """
-        all_orders = []
         # fulfillment_status=unfulfilled gets orders that haven't been fulfilled yet
         # Also exclude cancelled orders
         url = self._url(f"/orders.json?fulfillment_status=unfulfilled&status=open&limit={limit}")
-        
+        total = 0
+
         while url:
             try:
-                resp = requests.get(url, headers=self._headers(), timeout=30)
+                resp = self._session.get(url, timeout=(CONNECT_TIMEOUT, 30))
                 if resp.status_code != 200:
                     _logger.error("Failed to fetch unfulfilled orders: %s", resp.text)
-                    break
-                    
-                data = resp.json()
-                orders = data.get("orders", [])
-                all_orders.extend(orders)
-                
-                _logger.info("Fetched %d unfulfilled orders (total: %d)", len(orders), len(all_orders))
-                
-                # Check for pagination - Shopify uses Link header
-                link_header = resp.headers.get("Link", "")
-                url = None
-                if 'rel="next"' in link_header:
-                    # Parse the next URL from Link header
-                    for part in link_header.split(","):
-                        if 'rel="next"' in part:
-                            url = part.split(";")[0].strip().strip("<>")
-                            break
+                    return
+                orders = json_loads(resp.content).get("orders", [])
             except Exception as e:
                 _logger.exception("Error fetching unfulfilled orders: %s", e)
-                break
-                
-        return all_orders
+                return
+
+            total += len(orders)
+            _logger.info("Fetched %d unfulfilled orders (total: %d)", len(orders), total)
+            # requests parses the Link header; "next" is absent on the last page
+            url = resp.links.get("next", {}).get("url")
+            yield from orders
 
     @staticmethod
     def validate_webhook(payload: bytes, signature: str, secret: str) -> bool:
+        """Check Shopify's X-Shopify-Hmac-Sha256 header against the raw body."""
         if not signature:
             return False
-        digest = hmac.new(secret.encode(), payload, sha256).digest()
-        computed = base64.b64encode(digest).decode()
-        return hmac.compare_digest(computed, signature)
+        try:
+            expected = base64.b64decode(signature, validate=True)
+        except ValueError:  # binascii.Error, or a non-ASCII header
+            return False
+        return hmac.compare_digest(hmac.digest(secret.encode(), payload, "sha256"), expected)
 
     def get_product_variant(self, variant_id: str) -> Optional[Dict[str, Any]]:
-        """Fetch variant details to recover missing weight."""
+        """Fetch variant details to recover missing weight.
+
+        Successful lookups are cached for VARIANT_CACHE_TTL seconds.
+        """
+        key = str(variant_id)
+        now = time.monotonic()
+        with self._variant_cache_lock:
+            cached = self._variant_cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
         url = self._url(f"/variants/{variant_id}.json")
         try:
-            resp = requests.get(url, headers=self._headers(), timeout=10)
+            resp = self._session.get(url, timeout=(CONNECT_TIMEOUT, 10))
             if resp.status_code == 200:
-                return resp.json().get("variant")
+                variant = json_loads(resp.content).get("variant")
+                if variant:
+                    self._cache_variant(key, variant, now + VARIANT_CACHE_TTL)
+                return variant
             else:
                 _logger.warning("Failed to fetch variant %s: %s", variant_id, resp.status_code)
         except Exception as e:
             _logger.warning("Error fetching variant %s: %s", variant_id, e)
         return None
 
+    def _cache_variant(self, key: str, variant: Dict[str, Any], expires_at: float):
+        with self._variant_cache_lock:
+            cache = self._variant_cache
+            cache.pop(key, None)
+            if len(cache) >= VARIANT_CACHE_SIZE:
+                # Entries are kept in insertion order; drop the oldest.
+                del cache[next(iter(cache))]
+            cache[key] = (expires_at, variant)
+
     @staticmethod
     def _truthy_metafield_value(value) -> bool:
         if isinstance(value, bool):
@@ -285,13 +429,13 @@ class ShopifyAPI:
 
         target_key = self._normalized_metafield_key(metafield_key)
         url = self._url(f"/products/{product_id}/metafields.json?limit=250")
-        resp = requests.get(url, headers=self._headers(), timeout=15)
+        resp = self._session.get(url, timeout=(CONNECT_TIMEOUT, 15))
         if resp.status_code >= 400:
             raise exceptions.UserError(
                 f"Product metafield lookup failed for product {product_id}: {resp.text}"
             )
 
-        for metafield in resp.json().get("metafields", []):
+        for metafield in json_loads(resp.content).get("metafields", []):
             key = metafield.get("key")
             if self._normalized_metafield_key(key) != target_key:
                 continue
@@ -326,7 +470,7 @@ class ShopifyAPI:
             raise ValueError(f"Unsupported metafield owner kind: {owner_kind}")
         url = self._url(f"/{owner_kind}/{owner_id}/metafields.json?limit=250")
         try:
-            resp = requests.get(url, headers=self._headers(), timeout=15)
+            resp = self._session.get(url, timeout=(CONNECT_TIMEOUT, 15))
         except Exception as exc:  # pylint: disable=broad-except
             _logger.warning("Metafield fetch failed for %s/%s: %s", owner_kind, owner_id, exc)
             return []
@@ -338,7 +482,7 @@ class ShopifyAPI:
                 resp.status_code, owner_kind, owner_id, resp.text,
             )
             return []
-        return resp.json().get("metafields", []) or []
+        return json_loads(resp.content).get("metafields", []) or []
 
     def get_variant_restock_metafields(
         self,
@@ -394,14 +538,14 @@ class ShopifyAPI:
             }
         )
         url = self._url(f"/inventory_levels.json?{params}")
-        resp = requests.get(url, headers=self._headers(), timeout=15)
+        resp = self._session.get(url, timeout=(CONNECT_TIMEOUT, 15))
         if resp.status_code >= 400:
             raise exceptions.UserError(
                 f"Inventory level lookup failed for item {inventory_item_id} "
                 f"at location {location_id}: {resp.text}"
             )
 
-        levels = resp.json().get("inventory_levels", [])
+        levels = json_loads(resp.content).get("inventory_levels", [])
         return levels[0] if levels else None
 
     def get_available_inventory_quantity(self, inventory_item_id: str, location_id: str) -> float:
@@ -427,52 +571,84 @@ class ShopifyAPI:
                 f"Invalid Shopify available quantity for item {inventory_item_id}: {available}"
             ) from exc
 
-    def graphql_query(self, query: str) -> Dict[str, Any]:
-        """Execute a GraphQL query."""
+    def graphql_query(self, query: str, variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Execute a GraphQL query.
+
+        Pass values through ``variables`` rather than formatting them into
+        the query text, so they need no escaping and the text stays constant.
+        """
         url = self._url("/graphql.json")
+        body = {"query": query}
+        if variables:
+            body["variables"] = variables
         try:
-            resp = requests.post(url, headers=self._headers(), json={"query": query}, timeout=10)
+            resp = self._session.post(url, data=json_dumps(body), timeout=(CONNECT_TIMEOUT, 10))
             if resp.status_code == 200:
-                return resp.json()
+                return json_loads(resp.content)
             else:
                 _logger.error("GraphQL query failed: %s", resp.text)
         except Exception as e:
             _logger.exception("GraphQL request error: %s", e)
         return {}
 
-    def get_weight_by_sku(self, sku: str) -> float:
-        """Fetch weight in grams for a given SKU using GraphQL."""
-        query = """
-        {
-          productVariants(first: 1, query: "sku:%s") {
-            edges {
-              node {
-                weight
-                weightUnit
-              }
-            }
-          }
-        }
-        """ % sku
-        data = self.graphql_query(query)
+    def get_variant_weights_bulk(
+        self,
+        variant_ids: List[str],
+        skus: List[str],
+    ) -> Tuple[Dict[str, float], Dict[str, float]]:
+        """Fetch weights for variants by ID and by SKU in one search query.
+
+        Variant IDs and SKUs are OR-ed into a single productVariants search
+        (one GraphQL call per 50 terms) instead of one request per line. A
+        SKU can match several variants, so each search follows pageInfo
+        until every match is read.
+
+        Returns:
+            (grams by numeric variant ID, grams by lower-cased SKU); variants
+            with no weight are omitted.
+        """
+        unique_ids = list(dict.fromkeys(str(v).split("/")[-1] for v in variant_ids if v))
+        unique_skus = list(dict.fromkeys(sku for sku in skus if sku))
+        terms = [f"id:{variant_id}" for variant_id in unique_ids]
+        # Escape backslashes before quotes, so a SKU ending in a backslash
+        # can't escape the closing quote of its term.
+        terms += [
+            'sku:"%s"' % sku.replace("\\", "\\\\").replace('"', '\\"') for sku in unique_skus
+        ]
+
+        grams_by_variant: Dict[str, float] = {}
+        grams_by_sku: Dict[str, float] = {}
+        for i in range(0, len(terms), 50):
+            variables = {"query": " OR ".join(terms[i : i + 50])}
+            while True:
+                data = self.graphql_query(VARIANT_WEIGHTS_SEARCH_QUERY, variables)
+                try:
+                    variants = data["data"]["productVariants"]
+                    edges = variants["edges"]
+                except (KeyError, TypeError):  # failed query or GraphQL errors
+                    break
+                for edge in edges:
+                    node = edge["node"]
+                    grams = self._weight_to_grams(node.get("weight"), node.get("weightUnit"))
+                    if not grams:
+                        continue
+                    if node.get("id"):
+                        grams_by_variant[node["id"].split("/")[-1]] = grams
+                    if node.get("sku"):
+                        grams_by_sku.setdefault(node["sku"].lower(), grams)
+                page_info = variants.get("pageInfo") or {}
+                if not page_info.get("hasNextPage"):
+                    break
+                variables = {**variables, "after": page_info["endCursor"]}
+        return grams_by_variant, grams_by_sku
+
+    @staticmethod
+    def _weight_to_grams(weight, unit) -> float:
+        """Convert a Shopify weight/weightUnit pair to grams (0.0 if unknown)."""
         try:
-            edges = data.get("data", {}).get("productVariants", {}).get("edges", [])
-            if edges:
-                node = edges[0]["node"]
-                weight = node["weight"]
-                unit = node["weightUnit"]
-                # Convert to grams
-                if unit == "KILOGRAMS":
-                    return weight * 1000.0
-                elif unit == "GRAMS":
-                    return weight
-                elif unit == "POUNDS":
-                    return weight * 453.592
-                elif unit == "OUNCES":
-                    return weight * 28.3495
-        except Exception as e:
-            _logger.error("Failed to parse weight from GraphQL response: %s", e)
-        return 0.0
+            return weight * WEIGHT_UNIT_GRAMS[unit]
+        except (KeyError, TypeError):  # unknown unit or missing weight
+            return 0.0
 
     @staticmethod
     def _strongest_risk_level(levels: List[str]) -> Optional[str]:
@@ -511,13 +687,13 @@ class ShopifyAPI:
     def _get_risk_level_from_rest(self, shopify_order_id: str) -> str:
         numeric_id = str(shopify_order_id).split("/")[-1]
         url = self._url(f"/orders/{numeric_id}/risks.json")
-        resp = requests.get(url, headers=self._headers(), timeout=15)
+        resp = self._session.get(url, timeout=(CONNECT_TIMEOUT, 15))
         if resp.status_code >= 400:
             raise exceptions.UserError(
                 f"Shopify REST order risk lookup failed for {numeric_id}: {resp.status_code} {resp.text}"
             )
 
-        payload = resp.json()
+        payload = json_loads(resp.content)
         risks = payload.get("risks") or []
         levels = []
         for risk in risks:
@@ -546,20 +722,7 @@ class ShopifyAPI:
         if not str(gid).startswith("gid://"):
             gid = f"gid://shopify/Order/{shopify_order_id}"
 
-        query = """
-        {
-          order(id: "%s") {
-            risk {
-              recommendation
-              assessments {
-                riskLevel
-              }
-            }
-          }
-        }
-        """ % gid
-
-        data = self.graphql_query(query)
+        data = self.graphql_query(ORDER_RISK_QUERY, {"id": gid})
         errors = data.get("errors") or []
         if errors:
             _logger.warning("Shopify GraphQL risk lookup returned errors for %s: %s", shopify_order_id, errors)
@@ -570,3 +733,30 @@ class ShopifyAPI:
                 return risk_level
 
         return self._get_risk_level_from_rest(shopify_order_id)
+
+    def get_risk_levels_bulk(self, shopify_order_ids: List[str]) -> Dict[str, str]:
+        """Fetch risk levels for many orders in one GraphQL call per 100 IDs.
+
+        Returns {numeric order id: level} for orders whose GraphQL risk
+        summary yields a level. Orders missing from the result must still
+        go through get_risk_level(), which falls back to REST.
+        """
+        levels: Dict[str, str] = {}
+        unique_ids = list(dict.fromkeys(str(o).split("/")[-1] for o in shopify_order_ids if o))
+        for i in range(0, len(unique_ids), 100):
+            gids = [f"gid://shopify/Order/{order_id}" for order_id in unique_ids[i : i + 100]]
+            data = self.graphql_query(ORDER_RISKS_BY_ID_QUERY, {"ids": gids})
+            if data.get("errors"):
+                _logger.warning("Shopify GraphQL bulk risk lookup returned errors: %s", data["errors"])
+                continue
+            for node in (data.get("data") or {}).get("nodes") or []:
+                if not node or not node.get("id"):
+                    continue
+                risk_level = self._risk_level_from_summary(node.get("risk") or {})
+                if risk_level:
+                    levels[node["id"].split("/")[-1]] = risk_level
+        return levels
+
+
+# One client per shop and credential set for the life of the worker.
+_clients = ClientRegistry(ShopifyAPI)
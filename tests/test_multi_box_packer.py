@@ -117,6 +117,98 @@ class MultiBoxPackerTest(unittest.TestCase):
             total_units += quantities[42]
         self.assertEqual(total_units, 6)
 
+    def test_single_box_shortcut_keeps_one_item_per_unit(self):
+        boxes = [box(1, "Small (5lb)", 80, 3, 440, 10), box(2, "Large", 640, 10, 1728, 40)]
+        items = [
+            PackableItem(line_id=1, sku="A", weight_grams=300, quantity=3),
+            PackableItem(line_id=2, sku="B", weight_grams=500, quantity=2),
+        ]
+
+        result = MultiBoxPacker(items, boxes).pack()
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.box_count, 1)
+        packed_box = result.packed_boxes[0]
+        self.assertEqual(packed_box.box_spec.box_id, 1)
+        self.assertEqual(len(packed_box.items), 5)
+        self.assertEqual(packed_box.line_quantities, {1: 3, 2: 2})
+        self.assertEqual(packed_box.total_item_weight, 1900)
+
+    def test_smallest_fitting_box_bisect_matches_linear_scan(self):
+        boxes = [
+            box(1, "Small", 80, 3, 440, 10),
+            box(2, "Medium", 160, 5, 864, 20),
+            box(3, "Medium Light", 40, 4, 864, 5),
+            box(4, "Large", 640, 10, 1728, 40),
+            box(5, "No volume", 960, 16, 0, 60),
+        ]
+        packer = MultiBoxPacker([], boxes)
+        boxes_by_fit = sorted(boxes, key=packer._box_sort_key)
+        fit_volumes = packer._fit_volumes(boxes_by_fit)
+
+        for weight in (100, 1000, 2500, 5000, 20000, 30000):
+            for volume in (0, 100, 440, 441, 864, 1000, 1728, 5000):
+                with self.subTest(weight=weight, volume=volume):
+                    self.assertIs(
+                        packer._smallest_fitting_box(weight, volume, boxes_by_fit, fit_volumes),
+                        packer._smallest_fitting_box(weight, volume, boxes_by_fit),
+                    )
+
+    def test_open_bin_index_finds_same_bin_as_linear_first_fit(self):
+        target = box(1, "Medium", 160, 5, 864, 20)
+        packer = MultiBoxPacker([], [target])
+        weights = [1900, 1500, 1200, 900, 900, 700, 450, 450, 300, 120, 120, 60]
+        index = multi_box_packer._OpenBinIndex(len(weights), target)
+        bins = []
+
+        for weight in weights:
+            volume = packer._estimate_volume(weight)
+            expected = next(
+                (
+                    i
+                    for i, (current_weight, current_volume) in enumerate(bins)
+                    if packer._box_can_fit(
+                        target, current_weight + weight, current_volume + volume
+                    )
+                ),
+                None,
+            )
+            found = index.find_first(weight, volume)
+            with self.subTest(weight=weight):
+                self.assertEqual(found, expected)
+            if found is None:
+                bins.append((weight, volume))
+                index.update(len(bins) - 1, weight, volume)
+            else:
+                bins[found] = (bins[found][0] + weight, bins[found][1] + volume)
+                index.update(found, *bins[found])
+
+    def test_identical_item_bins_match_first_fit(self):
+        packer = MultiBoxPacker([], [])
+        for target in (box(1, "Small", 80, 3, 440, 10), box(2, "No volume", 160, 5, 0, 20)):
+            for count in (1, 5, 6, 13):
+                items = [PackableItem(line_id=7, sku="FLOUR", weight_grams=454.6)] * count
+                volumes = [packer._estimate_volume(454.6)] * count
+                with self.subTest(box=target.name, count=count):
+                    self.assertEqual(
+                        packer._identical_item_bins(items, volumes, target),
+                        packer._first_fit_bins(items, volumes, target),
+                    )
+
+    def test_box_specs_from_data_converts_ounces_and_sorts_by_capacity(self):
+        boxes_data = [
+            {"id": 1, "name": "Large", "max_weight": 640, "box_weight": 10, "volume": 1728, "priority": 40},
+            {"id": 2, "name": "Small", "max_weight": 80, "box_weight": 3, "volume": 440, "priority": 10},
+            {"id": 3, "name": "Unweighed", "max_weight": 0, "box_weight": 1, "volume": 512, "priority": False},
+        ]
+
+        specs = multi_box_packer.box_specs_from_data(boxes_data)
+
+        self.assertEqual([spec.box_id for spec in specs], [3, 2, 1])
+        self.assertAlmostEqual(specs[1].max_weight_grams, 80 * GRAMS_PER_OUNCE)
+        self.assertAlmostEqual(specs[1].box_weight_grams, 3 * GRAMS_PER_OUNCE)
+        self.assertEqual(specs[0].priority, 9999)
+
 
 if __name__ == "__main__":
     unittest.main()
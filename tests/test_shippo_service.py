@@ -3,7 +3,7 @@ import sys
 import types
 import unittest
 from pathlib import Path
-from unittest.mock import Mock, patch
+from unittest.mock import MagicMock, Mock, patch
 
 
 ROOT = Path(__file__).resolve().parents[1]
@@ -65,7 +65,7 @@ class ShippoRateRetryTest(unittest.TestCase):
         ]
         service = shippo_service.ShippoService("test-key")
 
-        with patch.object(shippo_service.requests, "post", side_effect=responses) as post:
+        with patch.object(service._session, "post", side_effect=responses) as post:
             with patch.object(shippo_service.time, "sleep") as sleep:
                 response = service._post_rate_request("https://example.test", {})
 
@@ -78,7 +78,7 @@ class ShippoRateRetryTest(unittest.TestCase):
         response_400 = Mock(status_code=400, text="invalid phone")
 
         with patch.object(
-            shippo_service.requests, "post", return_value=response_400
+            service._session, "post", return_value=response_400
         ) as post:
             with patch.object(shippo_service.time, "sleep") as sleep:
                 response = service._post_rate_request("https://example.test", {})
@@ -88,5 +88,59 @@ class ShippoRateRetryTest(unittest.TestCase):
         sleep.assert_not_called()
 
 
+class ShippoClientCacheTest(unittest.TestCase):
+    def test_from_env_reuses_client_for_same_credentials(self):
+        env = {"ir.config_parameter": Mock()}
+        icp = env["ir.config_parameter"].sudo.return_value
+        icp.get_param.side_effect = {
+            "shippo.api_key": "cache-key",
+            "shippo.shipper_phone": "555-000-0000",
+        }.get
+
+        first = shippo_service.ShippoService.from_env(env)
+        second = shippo_service.ShippoService.from_env(env)
+
+        self.assertIs(first, second)
+        self.assertIs(first._session, second._session)
+
+    def test_session_retries_transient_errors_but_never_posts(self):
+        service = shippo_service.ShippoService("test-key")
+
+        retry = service._session.get_adapter(service.API_URL).max_retries
+
+        self.assertEqual(retry.total, 3)
+        self.assertIn(503, retry.status_forcelist)
+        self.assertNotIn("POST", retry.allowed_methods)
+        self.assertIn("GET", retry.allowed_methods)
+
+    def test_session_carries_auth_header_except_for_label_downloads(self):
+        service = shippo_service.ShippoService("test-key")
+        self.assertEqual(
+            service._session.headers["Authorization"], "ShippoToken test-key"
+        )
+
+        response = MagicMock(status_code=200, content=b"^XA^XZ", encoding="utf-8", headers={})
+        response.__enter__.return_value = response
+        with patch.object(service._session, "get", return_value=response) as get:
+            self.assertEqual(service._download_url("https://labels.test/1.zpl"), "^XA^XZ")
+
+        self.assertEqual(get.call_args.kwargs["headers"], {"Authorization": None})
+
+    def test_fetch_label_zpl_caches_successful_downloads_only(self):
+        shippo_service._label_cache.clear()
+        service = shippo_service.ShippoService("test-key")
+        other_service = shippo_service.ShippoService("other-key")
+
+        with patch.object(service, "_download_url", side_effect=[None, "^XA^XZ"]) as download:
+            self.assertIsNone(service.fetch_label_zpl("https://labels.test/2.zpl"))
+            self.assertEqual(service.fetch_label_zpl("https://labels.test/2.zpl"), "^XA^XZ")
+            self.assertEqual(service.fetch_label_zpl("https://labels.test/2.zpl"), "^XA^XZ")
+
+        self.assertEqual(download.call_count, 2)
+        with patch.object(other_service, "_download_url") as other_download:
+            self.assertEqual(other_service.fetch_label_zpl("https://labels.test/2.zpl"), "^XA^XZ")
+        other_download.assert_not_called()
+
+
 if __name__ == "__main__":
     unittest.main()
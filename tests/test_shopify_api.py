@@ -0,0 +1,174 @@
+import base64
+import hashlib
+import hmac
+import importlib.util
+import sys
+import types
+import unittest
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+
+ROOT = Path(__file__).resolve().parents[1]
+SERVICE_PATH = ROOT / "shopify_fulfillment" / "services" / "shopify_api.py"
+MODULE_NAME = "shopify_fulfillment.services.shopify_api"
+
+# Load the service without requiring a complete Odoo runtime.
+odoo = types.ModuleType("odoo")
+odoo.exceptions = types.SimpleNamespace(UserError=RuntimeError)
+sys.modules.setdefault("odoo", odoo)
+
+package = sys.modules.setdefault(
+    "shopify_fulfillment", types.ModuleType("shopify_fulfillment")
+)
+package.__path__ = [str(ROOT / "shopify_fulfillment")]
+services_package = sys.modules.setdefault(
+    "shopify_fulfillment.services", types.ModuleType("shopify_fulfillment.services")
+)
+services_package.__path__ = [str(ROOT / "shopify_fulfillment" / "services")]
+
+spec = importlib.util.spec_from_file_location(MODULE_NAME, SERVICE_PATH)
+shopify_api = importlib.util.module_from_spec(spec)
+sys.modules[MODULE_NAME] = shopify_api
+spec.loader.exec_module(shopify_api)
+
+
+def variant_edges(*nodes):
+    return {"data": {"productVariants": {"edges": [{"node": node} for node in nodes]}}}
+
+
+class ShopifyVariantWeightsBulkTest(unittest.TestCase):
+    def test_batches_ids_and_skus_and_converts_units(self):
+        api = shopify_api.ShopifyAPI("shop.example", "token", "2024-01")
+        response = variant_edges(
+            {"id": "gid://shopify/ProductVariant/1", "sku": "FLOUR-5", "weight": 5, "weightUnit": "POUNDS"},
+            {"id": "gid://shopify/ProductVariant/2", "sku": "oats", "weight": 500, "weightUnit": "GRAMS"},
+            {"id": "gid://shopify/ProductVariant/3", "sku": "MYSTERY", "weight": 1, "weightUnit": "STONES"},
+        )
+
+        with patch.object(shopify_api.ShopifyAPI, "graphql_query", return_value=response) as query:
+            by_variant, by_sku = api.get_variant_weights_bulk(
+                ["gid://shopify/ProductVariant/2"], ["FLOUR-5", "OATS", "MYSTERY", "MISSING"]
+            )
+
+        query.assert_called_once()
+        self.assertEqual(
+            query.call_args.args[1],
+            {"query": 'id:2 OR sku:"FLOUR-5" OR sku:"OATS" OR sku:"MYSTERY" OR sku:"MISSING"'},
+        )
+        self.assertEqual(by_variant, {"1": 5 * 453.592, "2": 500.0})
+        self.assertEqual(by_sku, {"flour-5": 5 * 453.592, "oats": 500.0})
+
+    def test_escapes_skus_and_follows_result_pages(self):
+        api = shopify_api.ShopifyAPI("shop.example", "token", "2024-01")
+        first = variant_edges(
+            {"id": "gid://shopify/ProductVariant/1", "sku": "A\\", "weight": 1, "weightUnit": "KILOGRAMS"}
+        )
+        first["data"]["productVariants"]["pageInfo"] = {"hasNextPage": True, "endCursor": "c1"}
+        last = variant_edges(
+            {"id": "gid://shopify/ProductVariant/2", "sku": 'B"', "weight": 2, "weightUnit": "GRAMS"}
+        )
+
+        with patch.object(shopify_api.ShopifyAPI, "graphql_query", side_effect=[first, last]) as query:
+            by_variant, by_sku = api.get_variant_weights_bulk([], ["A\\", 'B"'])
+
+        search = r'sku:"A\\" OR sku:"B\""'
+        self.assertEqual(
+            [call.args[1] for call in query.call_args_list],
+            [{"query": search}, {"query": search, "after": "c1"}],
+        )
+        self.assertEqual(by_variant, {"1": 1000.0, "2": 2.0})
+        self.assertEqual(by_sku, {"a\\": 1000.0, 'b"': 2.0})
+
+
+class ShopifyOrderPaginationTest(unittest.TestCase):
+    def test_iter_unfulfilled_orders_follows_next_links(self):
+        api = shopify_api.ShopifyAPI("shop.example", "token", "2024-01")
+        first = Mock(status_code=200, content=b'{"orders": [{"id": 1}, {"id": 2}]}')
+        first.links = {"next": {"url": "https://shop.example/page-2"}}
+        last = Mock(status_code=200, content=b'{"orders": [{"id": 3}]}')
+        last.links = {}
+
+        with patch.object(api._session, "get", side_effect=[first, last]) as get:
+            orders = api.iter_unfulfilled_orders()
+            self.assertEqual(next(orders)["id"], 1)
+            self.assertEqual(get.call_count, 1)
+            self.assertEqual([order["id"] for order in orders], [2, 3])
+
+        self.assertEqual(get.call_args.args[0], "https://shop.example/page-2")
+
+
+class ShopifyCallLimitTest(unittest.TestCase):
+    def test_throttle_pauses_only_when_bucket_is_nearly_full(self):
+        for header, paused in (("39/40", True), ("32/40", True), ("10/40", False), ("", False)):
+            response = Mock(headers={shopify_api.CALL_LIMIT_HEADER: header})
+            with self.subTest(header=header), patch.object(shopify_api.time, "sleep") as sleep:
+                shopify_api._throttle_on_call_limit(response)
+                self.assertEqual(sleep.called, paused)
+
+
+class ShopifyVariantCacheTest(unittest.TestCase):
+    def test_get_product_variant_is_cached_until_the_ttl_expires(self):
+        api = shopify_api.ShopifyAPI("shop.example", "token", "2024-01")
+        response = Mock(status_code=200)
+        response.content = b'{"variant": {"id": 7, "inventory_item_id": 70}}'
+
+        with patch.object(api._session, "get", return_value=response) as get, patch.object(
+            shopify_api.time, "monotonic", return_value=1000.0
+        ) as clock:
+            self.assertEqual(api.get_product_variant("7")["inventory_item_id"], 70)
+            self.assertEqual(api.get_product_variant(7)["inventory_item_id"], 70)
+            self.assertEqual(get.call_count, 1)
+
+            clock.return_value += shopify_api.VARIANT_CACHE_TTL
+            api.get_product_variant("7")
+            self.assertEqual(get.call_count, 2)
+
+
+class ShopifyClientReuseTest(unittest.TestCase):
+    def test_client_is_shared_per_credential_set_and_never_closed_on_rotation(self):
+        build = shopify_api._clients.get
+        client = build("reuse.example", "token", "2024-01")
+
+        self.assertIs(build("reuse.example", "token", "2024-01"), client)
+        self.assertIsNot(build("reuse.example", "token", "2024-04"), client)
+        with patch.object(client._session, "close") as close_session:
+            other = build("reuse.example", "other-token", "2024-01")
+            self.assertIsNot(other, client)
+            # Another database still using the first token keeps its client.
+            self.assertIs(build("reuse.example", "token", "2024-01"), client)
+            self.assertIs(build("reuse.example", "other-token", "2024-01"), other)
+        close_session.assert_not_called()
+
+    def test_registry_drops_old_clients_without_closing_them(self):
+        registry = shopify_api.ClientRegistry(lambda *args: Mock(), maxsize=2)
+        first = registry.get("a")
+        second = registry.get("b")
+        third = registry.get("c")
+        fresh = registry.get("a")
+
+        self.assertIsNot(fresh, first)
+        registry.close_all()
+        first.close.assert_not_called()
+        second.close.assert_not_called()
+        third.close.assert_called_once()
+        fresh.close.assert_called_once()
+
+
+class ShopifyWebhookValidationTest(unittest.TestCase):
+    def test_validate_webhook_accepts_only_matching_signature(self):
+        payload = b'{"id": 1}'
+        signature = base64.b64encode(
+            hmac.new(b"secret", payload, hashlib.sha256).digest()
+        ).decode()
+        validate = shopify_api.ShopifyAPI.validate_webhook
+
+        self.assertTrue(validate(payload, signature, "secret"))
+        self.assertFalse(validate(payload, signature, "other-secret"))
+        self.assertFalse(validate(payload, "", "secret"))
+        self.assertFalse(validate(payload, "não-base64", "secret"))
+        self.assertFalse(validate(payload, signature.rstrip("="), "secret"))
+
+
+if __name__ == "__main__":
+    unittest.main()
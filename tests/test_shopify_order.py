@@ -0,0 +1,170 @@
+import importlib.util
+import sys
+import types
+import unittest
+from pathlib import Path
+from unittest.mock import Mock
+
+try:
+    import dateutil  # noqa: F401  (imported by the model; ships with Odoo)
+except ImportError:
+    raise unittest.SkipTest("python-dateutil is required to load the order model")
+
+
+ROOT = Path(__file__).resolve().parents[1]
+MODEL_PATH = ROOT / "shopify_fulfillment" / "models" / "shopify_order.py"
+MODULE_NAME = "shopify_fulfillment.models.shopify_order"
+
+# Load the model without requiring a complete Odoo runtime.
+odoo = sys.modules.setdefault("odoo", types.ModuleType("odoo"))
+if not hasattr(odoo, "exceptions"):
+    odoo.exceptions = types.SimpleNamespace(UserError=RuntimeError)
+
+
+class _Field:
+    def __init__(self, *args, **kwargs):
+        pass
+
+
+class _Datetime(_Field):
+    @staticmethod
+    def now():
+        return "2026-01-01 00:00:00"
+
+
+odoo.fields = types.SimpleNamespace(
+    **{
+        name: _Field
+        for name in (
+            "Boolean", "Char", "Float", "Integer",
+            "Many2one", "One2many", "Selection", "Text",
+        )
+    },
+    Datetime=_Datetime,
+)
+odoo.models = types.SimpleNamespace(Model=object)
+odoo.api = types.SimpleNamespace(
+    model=lambda method: method,
+    depends=lambda *names: (lambda method: method),
+)
+odoo_tools = types.ModuleType("odoo.tools")
+odoo_tools_sql = types.ModuleType("odoo.tools.sql")
+odoo_tools_sql.create_index = Mock()
+odoo_tools.sql = odoo_tools_sql
+sys.modules.setdefault("odoo.tools", odoo_tools)
+sys.modules.setdefault("odoo.tools.sql", odoo_tools_sql)
+
+package = sys.modules.setdefault(
+    "shopify_fulfillment", types.ModuleType("shopify_fulfillment")
+)
+package.__path__ = [str(ROOT / "shopify_fulfillment")]
+for subpackage in ("models", "services"):
+    module = sys.modules.setdefault(
+        f"shopify_fulfillment.{subpackage}",
+        types.ModuleType(f"shopify_fulfillment.{subpackage}"),
+    )
+    module.__path__ = [str(ROOT / "shopify_fulfillment" / subpackage)]
+
+spec = importlib.util.spec_from_file_location(MODULE_NAME, MODEL_PATH)
+shopify_order = importlib.util.module_from_spec(spec)
+sys.modules[MODULE_NAME] = shopify_order
+spec.loader.exec_module(shopify_order)
+
+ShopifyOrder = shopify_order.ShopifyOrder
+
+
+class FakeOrders(ShopifyOrder):
+    """Just enough of a shopify.order recordset for the helpers under test.
+
+    Record ``i`` has Shopify ID ``str(i)``; writes are recorded in ``writes``.
+    """
+
+    def __init__(self, ids, cr=None, writes=None):
+        self.ids = list(ids)
+        self.env = types.SimpleNamespace(cr=cr)
+        self.writes = [] if writes is None else writes
+
+    def __len__(self):
+        return len(self.ids)
+
+    def filtered(self, predicate):
+        return FakeOrders(
+            [i for i in self.ids if predicate(types.SimpleNamespace(id=i, shopify_id=str(i)))],
+            self.env.cr,
+            self.writes,
+        )
+
+    def write(self, vals):
+        self.writes.append((list(self.ids), vals))
+
+    def mapped(self, field):
+        return [f"#{i}" for i in self.ids]
+
+
+class LockForProcessingTest(unittest.TestCase):
+    def test_orders_locked_by_another_worker_are_skipped(self):
+        cr = Mock()
+        cr.fetchall.return_value = [(1,), (3,)]
+
+        locked = FakeOrders([1, 2, 3], cr)._lock_for_processing()
+
+        self.assertEqual(locked.ids, [1, 3])
+        query, params = cr.execute.call_args.args
+        self.assertIn("FOR UPDATE SKIP LOCKED", query)
+        self.assertEqual(params, ((1, 2, 3),))
+
+    def test_manual_process_reports_skipped_orders(self):
+        orders = FakeOrders([1, 2])
+
+        orders.process_order = lambda: FakeOrders([2])
+        action = orders.action_process()
+        self.assertEqual(action["params"]["type"], "warning")
+        self.assertIn("#2", action["params"]["message"])
+
+        orders.process_order = lambda: FakeOrders([])
+        self.assertIsNone(orders.action_process())
+
+
+
+class UpdateLocalOrdersTest(unittest.TestCase):
+    def test_failed_fetch_leaves_orders_unstamped(self):
+        orders = FakeOrders([1, 2])
+
+        orders._update_local_orders(orders, [])
+
+        self.assertEqual(orders.writes, [])
+
+    def test_only_returned_orders_are_stamped_and_archived(self):
+        orders = FakeOrders([1, 2, 3])
+
+        orders._update_local_orders(
+            orders, [{"id": 1, "fulfillment_status": "fulfilled"}, {"id": 3}]
+        )
+
+        self.assertEqual(
+            orders.writes,
+            [
+                ([1], {"active": False}),
+                ([1, 3], {"last_shopify_sync_at": "2026-01-01 00:00:00"}),
+            ],
+        )
+
+
+
+class UnrecordedLabelsMessageTest(unittest.TestCase):
+    def test_names_purchased_transactions_only(self):
+        results = {
+            1: {"shipment_vals": {"shippo_transaction_id": "txn_1"}},
+            2: RuntimeError("no rates"),
+            3: {"shipment_vals": {}},
+        }
+
+        message = ShopifyOrder._unrecorded_labels_message(RuntimeError("boom"), results)
+
+        self.assertTrue(message.startswith("boom\n"))
+        self.assertTrue(message.endswith(": txn_1"))
+        self.assertEqual(ShopifyOrder._unrecorded_labels_message(RuntimeError("boom"), {}), "boom")
+
+
+if __name__ == "__main__":
+    unittest.main()